@@ -0,0 +1,255 @@
+import argparse
+import random
+import sys
+import time
+from array import array
+from collections import deque, namedtuple
+
+import engine
+from engine import DIRECTIONS, FreeCells
+
+# this module plays many snakes on one board at once. every snake writes its body
+# into the same occupied dictionary (tile -> number of body parts on it) and the same
+# FreeCells, and fruit are kept in a set of tiles, so checking a head for walls,
+# bodies, other heads and fruit is a few dictionary lookups no matter how many snakes
+# there are or how long they are. a tick costs about the same for every snake
+
+# what a tick of the arena returns
+# eaten is the index of every snake that ate a fruit this tick and deaths is the
+# index and cause ("wall", "head" if it ran into another head, "body" if it ran into
+# any snake's body including its own) of every snake that died
+ArenaStep = namedtuple("ArenaStep", ["eaten", "deaths"])
+
+# a snake that shares its board with other snakes. it moves, grows and collides like
+# engine.Snake but its body goes into the arena's occupied tiles and free tiles
+class ArenaSnake(engine.Snake):
+    __slots__ = ("alive", "score")
+
+    # occupied and free_cells are the arena's, shared with every other snake
+    def __init__(self, grid, occupied, free_cells):
+        self.grid = grid
+        self.occupied = occupied
+        self.free_cells = free_cells
+        # an arena snake is never copied, its occupied tiles are the arena's
+        self.shared = None
+        # the ring starts small and doubles when it fills up since most snakes
+        # in a crowded arena die long before they get long
+        self.cells = array("H" if grid[0] * grid[1] + 1 <= 65536 else "I", [0]) * 16
+        self.length = 0
+        self.head_ptr = 0
+        self.alive = False
+        self.score = 0
+
+    # puts a new snake that is only a head on the given tile going the given direction
+    def spawn(self, pos, direction):
+        self.head_x, self.head_y = pos
+        self.prev_head = pos
+        self.head_ptr = 0
+        self.length = 1
+        tile = self.head_y * self.grid[0] + self.head_x
+        self.cells[0] = tile
+        self.occupy(tile)
+        self.current_dir = direction
+        self.user_dirs = deque([])
+        self.alive = True
+        self.score = 0
+
+    # takes every body part of the snake off the board
+    def remove(self):
+        cells = self.cells
+        ptr = self.head_ptr
+        for _ in range(self.length):
+            self.vacate(cells[ptr])
+            ptr -= 1
+        self.length = 0
+        self.alive = False
+
+    # checks if the head is on a fruit and eats it, fruits is the arena's Fruits
+    def collides_with_food(self, fruits):
+        return fruits.eat(self.head_y * self.grid[0] + self.head_x)
+
+# every fruit on the arena's board as a set of tiles (y * width + x)
+class Fruits():
+    __slots__ = ("rng", "free_cells", "tiles", "owed")
+
+    # free_cells is the arena's FreeCells so fruit never spawns inside a snake
+    def __init__(self, rng, free_cells):
+        self.rng = rng
+        self.free_cells = free_cells
+        self.tiles = set()
+        # fruits that couldn't spawn because every free tile had a fruit, they are
+        # spawned by retry once there is room so the arena never loses a fruit
+        self.owed = 0
+
+    # number of fruits on the board
+    def __len__(self):
+        return len(self.tiles)
+
+    # removes the fruit on a tile if there is one, returns true if there was
+    def eat(self, tile):
+        if tile in self.tiles:
+            self.tiles.remove(tile)
+            return True
+        return False
+
+    # creates a fruit on a random free tile that doesn't already have one
+    # returns false (and owes the fruit) if every free tile already has a fruit
+    def spawn(self, grid):
+        if self.place(grid):
+            return True
+        self.owed += 1
+        return False
+
+    # spawns as many of the owed fruits as there is room for
+    def retry(self, grid):
+        while self.owed and self.place(grid):
+            self.owed -= 1
+
+    # puts a fruit on a random free tile without one, returns false if there is none
+    def place(self, grid):
+        if len(self.free_cells) <= len(self.tiles):
+            return False
+        while True:
+            x, y = self.free_cells.choice(self.rng)
+            tile = y * grid[0] + x
+            if tile not in self.tiles:
+                self.tiles.add(tile)
+                return True
+
+    # goes through the x and y of every fruit
+    def positions(self, width):
+        for tile in self.tiles:
+            yield (tile % width, tile // width)
+
+# many snakes and fruits on one board that can be played one tick at a time
+class Arena():
+    # grid is the number of tiles in the x and y axis, snakes and fruits are how many
+    # of each are on the board and seed makes the arena repeatable. if respawn is
+    # true a snake that dies starts over as a new snake on a random free tile
+    def __init__(self, grid=(100, 100), snakes=16, fruits=16, seed=None, respawn=True):
+        if snakes + fruits > grid[0] * grid[1]:
+            raise ValueError(f"{snakes} snakes and {fruits} fruits don't fit on a {grid[0]}x{grid[1]} board")
+        self.grid = grid
+        self.respawn = respawn
+        # every random choice in the arena comes from this so the seed decides the whole game
+        self.rng = random.Random(seed)
+        # the tiles every snake is on, shared by all of them
+        self.occupied = {}
+        self.free_cells = FreeCells(grid)
+        self.fruits = Fruits(self.rng, self.free_cells)
+        self.snakes = [ArenaSnake(grid, self.occupied, self.free_cells) for _ in range(snakes)]
+        # dead snakes waiting for a free tile to respawn on
+        self.waiting = deque()
+        for snake in self.snakes:
+            if not self.place(snake):
+                self.waiting.append(snake)
+        for _ in range(fruits):
+            self.fruits.spawn(grid)
+        self.ticks = 0
+        # number of deaths by cause since the start
+        self.deaths = {"wall": 0, "head": 0, "body": 0}
+
+    # spawns a snake on a random free tile without a fruit going a random direction
+    # returns false (leaving the snake dead) if every free tile has a fruit on it
+    def place(self, snake):
+        if len(self.free_cells) <= len(self.fruits.tiles):
+            return False
+        width = self.grid[0]
+        while True:
+            x, y = self.free_cells.choice(self.rng)
+            if y * width + x not in self.fruits.tiles:
+                break
+        snake.spawn((x, y), self.rng.choice(DIRECTIONS))
+        return True
+
+    # number of snakes that are alive
+    def alive(self):
+        return sum(1 for snake in self.snakes if snake.alive)
+
+    # plays one tick. actions has a Direction (or None to use the snake's user input
+    # queue) for every snake, or is None to move every snake the way it is going
+    # every snake moves first and collisions are checked after, so a snake can move
+    # onto the tile another snake's tail left this tick no matter which moved first
+    def step(self, actions=None):
+        grid = self.grid
+        width, height = grid
+        fruits = self.fruits
+        snakes = self.snakes
+
+        # move every snake and count how many heads ended up on each tile
+        eaten = []
+        heads = {}
+        for index, snake in enumerate(snakes):
+            if not snake.alive:
+                continue
+            if snake.step(fruits, grid, None if actions is None else actions[index]):
+                snake.score += 1
+                eaten.append(index)
+            head_x, head_y = snake.head_x, snake.head_y
+            if 0 <= head_x < width and 0 <= head_y < height:
+                tile = head_y * width + head_x
+                heads[tile] = heads.get(tile, 0) + 1
+
+        # a head off the board hit a wall, a head sharing its tile with another head
+        # hit it head on, and any other body part on the head's tile was hit by it
+        occupied = self.occupied
+        deaths = []
+        for index, snake in enumerate(snakes):
+            if not snake.alive:
+                continue
+            head_x, head_y = snake.head_x, snake.head_y
+            tile = head_y * width + head_x
+            if head_x < 0 or head_x >= width or head_y < 0 or head_y >= height:
+                deaths.append((index, "wall"))
+            elif heads[tile] > 1:
+                deaths.append((index, "head"))
+            elif occupied[tile] > 1:
+                deaths.append((index, "body"))
+
+        # the dead are only taken off the board once every death is known so
+        # two snakes that hit each other this tick both die
+        for index, cause in deaths:
+            snakes[index].remove()
+            self.deaths[cause] += 1
+        # snakes that died earlier and couldn't find a tile get the first go, the rest
+        # wait for a later tick when the board has room again
+        if self.respawn:
+            waiting = self.waiting
+            waiting.extend(snakes[index] for index, _ in deaths)
+            while waiting and self.place(waiting[0]):
+                waiting.popleft()
+        # fruits eaten while the board was full spawn now if the dead left room
+        fruits.retry(grid)
+
+        self.ticks += 1
+        return ArenaStep(eaten, deaths)
+
+# plays an arena of snakes that turn randomly and prints how fast it went
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="plays many snakes on one board without a window")
+    parser.add_argument("--snakes", type=int, default=1000, help="number of snakes")
+    parser.add_argument("--fruits", type=int, default=1000, help="number of fruits")
+    parser.add_argument("--width", type=int, default=500, help="number of tiles in the x axis")
+    parser.add_argument("--height", type=int, default=500, help="number of tiles in the y axis")
+    parser.add_argument("--ticks", type=int, default=1000, help="number of ticks to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the arena and the snakes' turns")
+    args = parser.parse_args(argv)
+
+    arena = Arena((args.width, args.height), args.snakes, args.fruits, args.seed)
+    rng = arena.rng
+    eaten = 0
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        # every snake turns about one tick in ten
+        actions = [rng.choice(DIRECTIONS) if rng.random() < 0.1 else None for _ in range(args.snakes)]
+        eaten += len(arena.step(actions).eaten)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.ticks} ticks of {args.snakes} snakes in {elapsed:.2f}s "
+          f"({args.ticks / elapsed:.0f} ticks/sec, {args.ticks * args.snakes / elapsed:.0f} snake moves/sec)")
+    print(f"{eaten} fruits eaten, deaths {arena.deaths}, longest snake {max(len(snake) for snake in arena.snakes)}")
+    return 0
+
+# runs if we're running the script itself
+if __name__ == "__main__":
+    sys.exit(main())
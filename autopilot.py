@@ -0,0 +1,267 @@
+import weakref
+from collections import deque
+
+from engine import DENSE_LIMIT, OPPOSITE, STEPS
+from profiler import Profiler
+
+# this module plays the game by itself. it keeps a distance field of how many moves
+# every tile is from the fruit (a breadth first search out from the fruit around the
+# snake) and moves the head to whichever neighbour is closest. the field is only built
+# from scratch when the fruit moves or the snake starts over, in between the tile the
+# tail leaves is patched into it so a decision costs about the same on any board size.
+# if the fruit can't be reached the snake follows its own tail to stay alive
+
+# distance of a tile that can't reach the target
+UNREACHED = 1 << 30
+# most tiles a single patch updates, the rest keep their older (longer but still
+# walkable) distances so a patch never costs as much as a rebuild
+PATCH_LIMIT = 64
+
+# distances of tiles to one target tile. only the tiles a search or patch gave a
+# distance are remembered, so starting a new search resets those instead of the
+# whole board and a field that only reached a few tiles costs a few tiles to clear
+class Field():
+    __slots__ = ("dist", "visited", "target", "expected")
+
+    # size is the number of tiles on the board
+    def __init__(self, size):
+        # distance of every tile (y * width + x) to the target
+        self.dist = [UNREACHED] * size
+        # every tile whose distance isn't UNREACHED
+        self.visited = []
+        # the tile the field was built for (None means it needs building)
+        self.target = None
+        # distance of the last tile moved to, the next one has to be closer or the
+        # field is out of date and gets rebuilt
+        self.expected = UNREACHED
+
+    # makes every tile unreached again
+    def clear(self):
+        dist = self.dist
+        for tile in self.visited:
+            dist[tile] = UNREACHED
+        self.visited.clear()
+
+class Autopilot():
+    # snake and fruit are the ones to drive and grid is the number of tiles in the x and y axis
+    def __init__(self, snake, fruit, grid):
+        # the distance field has a number for every tile, which is too much memory
+        # (and too slow to search) on the boards that only keep their taken tiles
+        if grid[0] * grid[1] > DENSE_LIMIT:
+            raise ValueError(f"the autopilot plays boards of up to {DENSE_LIMIT} tiles, got {grid[0]}x{grid[1]}")
+        self.snake = snake
+        self.fruit = fruit
+        self.grid = grid
+        # distances to the fruit, and to where the tail was for when the fruit can't be
+        # reached. both are kept between decisions and only built again when following
+        # them stops getting the head closer
+        self.fruit_field = Field(grid[0] * grid[1])
+        self.tail_field = Field(grid[0] * grid[1])
+        # the direction and tile of every tile's neighbours on the board, worked out
+        # once since the searches look them up for every tile they visit
+        self.adjacent = [list(self.neighbours(tile)) for tile in range(grid[0] * grid[1])]
+        # head, tail and length of the snake at the last decision
+        self.last_head = None
+        self.last_tail = None
+        self.last_length = 0
+
+        # how long each decision took and how often the fields were rebuilt, patched, etc.
+        # it never prints by itself, stats gets what it recorded
+        self.profiler = Profiler(interval=None)
+        for counter in ("rebuilds", "patches", "tail_chases", "tail_rebuilds", "stuck"):
+            self.profiler.count(counter, 0)
+
+    # gets the tiles next to a tile that are on the board with the direction to each
+    def neighbours(self, tile):
+        width, height = self.grid
+        x, y = tile % width, tile // width
+        for direction, (step_x, step_y) in STEPS.items():
+            next_x, next_y = x + step_x, y + step_y
+            if 0 <= next_x < width and 0 <= next_y < height:
+                yield direction, next_y * width + next_x
+
+    # builds a field from scratch with every free tile's distance to the target tile,
+    # stopping early once the head is next to a reached tile since everything closer
+    # than it is known. only the tiles the last search and patches reached are reset
+    def search(self, field, target, head):
+        field.clear()
+        dist = field.dist
+        visited = field.visited
+        occupied = self.snake.occupied
+        adjacent = self.adjacent
+        stop = [next_tile for _, next_tile in adjacent[head]]
+        dist[target] = 0
+        visited.append(target)
+        field.target = target
+        field.expected = UNREACHED
+        queue = deque([target])
+        while queue:
+            tile = queue.popleft()
+            distance = dist[tile] + 1
+            for _, next_tile in adjacent[tile]:
+                if dist[next_tile] == UNREACHED and next_tile not in occupied:
+                    dist[next_tile] = distance
+                    visited.append(next_tile)
+                    if next_tile in stop:
+                        return
+                    queue.append(next_tile)
+
+    # a tile became free so it and anything that can now get to the target through
+    # it gets a shorter distance. distances only ever go down here, tiles that became
+    # taken are left alone and caught by the check in closer instead
+    def patch(self, field, tile):
+        dist = field.dist
+        visited = field.visited
+        occupied = self.snake.occupied
+        adjacent = self.adjacent
+        best = min((dist[next_tile] for _, next_tile in adjacent[tile]
+                    if next_tile not in occupied), default=UNREACHED)
+        if best == UNREACHED or best + 1 >= dist[tile]:
+            return
+        if dist[tile] == UNREACHED:
+            visited.append(tile)
+        dist[tile] = best + 1
+        queue = deque([tile])
+        updated = 1
+        while queue and updated < PATCH_LIMIT:
+            current = queue.popleft()
+            distance = dist[current] + 1
+            for _, next_tile in adjacent[current]:
+                if distance < dist[next_tile] and next_tile not in occupied:
+                    if dist[next_tile] == UNREACHED:
+                        visited.append(next_tile)
+                    dist[next_tile] = distance
+                    queue.append(next_tile)
+                    updated += 1
+        self.profiler.count("patches")
+
+    # builds the fruit's field from scratch out to the head
+    def rebuild(self, target, head):
+        self.search(self.fruit_field, target, head)
+        self.profiler.count("rebuilds")
+
+    # picks the free neighbour of the head that is closer to the field's target than
+    # the last tile moved to, or None if there isn't one
+    def closer(self, field, head, blocked):
+        dist = field.dist
+        occupied = self.snake.occupied
+        best = None
+        best_distance = field.expected
+        for direction, next_tile in self.adjacent[head]:
+            if direction is blocked or next_tile in occupied:
+                continue
+            if dist[next_tile] < best_distance:
+                best = direction
+                best_distance = dist[next_tile]
+        if best is not None:
+            field.expected = best_distance
+        return best
+
+    # picks the neighbour of the head that leads to the tail so the snake circles
+    # around itself until the fruit can be reached again. the field leads to where the
+    # tail was when it was built, and the tail only moves on along the body from there,
+    # so it is followed (and patched as the tail frees tiles) until it stops getting
+    # the head closer instead of being searched again every tick
+    def toward_tail(self, head, tail, blocked):
+        self.profiler.count("tail_chases")
+        snake = self.snake
+        occupied = snake.occupied
+        fallback = None
+        for direction, next_tile in self.adjacent[head]:
+            if direction is blocked:
+                continue
+            # the tail moves out of the way this tick so its tile is safe to move to
+            if next_tile == tail and len(snake) > 2:
+                return direction
+            if next_tile not in occupied:
+                fallback = direction
+
+        field = self.tail_field
+        direction = None
+        if field.target is not None:
+            if self.last_tail is not None and self.last_tail not in occupied:
+                self.patch(field, self.last_tail)
+            direction = self.closer(field, head, blocked)
+        if direction is None:
+            self.search(field, tail, head)
+            self.profiler.count("tail_rebuilds")
+            direction = self.closer(field, head, blocked)
+        # no way to the tail either so any free tile keeps the snake alive a little longer
+        if direction is None:
+            self.profiler.count("stuck")
+            return fallback
+        return direction
+
+    # works out which direction the snake should go this tick (None to keep going straight)
+    def decide(self):
+        started = self.profiler.start()
+        snake = self.snake
+        width = self.grid[0]
+        fruit_pos = self.fruit.fruit_pos
+        head_x, head_y = snake.head()
+        head = head_y * width + head_x
+        tail_x, tail_y = snake.tail()
+        tail = tail_y * width + tail_x
+        # the snake can't turn around into itself
+        blocked = OPPOSITE[snake.current_dir]
+
+        # the head jumped since the last decision so the snake started over and
+        # neither field leads anywhere useful any more
+        last = self.last_head
+        if (last is None or len(snake) < self.last_length
+                or abs(last % width - head_x) + abs(last // width - head_y) > 1):
+            self.fruit_field.target = None
+            self.tail_field.target = None
+
+        direction = None
+        if fruit_pos is not None:
+            field = self.fruit_field
+            target = fruit_pos[1] * width + fruit_pos[0]
+            rebuilt = target != field.target
+            if rebuilt:
+                self.rebuild(target, head)
+            # the tail left a tile since the last decision
+            elif self.last_tail is not None and self.last_tail not in snake.occupied:
+                self.patch(field, self.last_tail)
+
+            direction = self.closer(field, head, blocked)
+            # the path being followed got blocked so the field is built again before giving
+            # up on the fruit (if it was already unreachable the patches keep it up to date)
+            if direction is None and not rebuilt and field.expected != UNREACHED:
+                self.rebuild(target, head)
+                direction = self.closer(field, head, blocked)
+
+        if direction is None:
+            direction = self.toward_tail(head, tail, blocked)
+
+        self.last_head = head
+        self.last_tail = tail
+        self.last_length = len(snake)
+        self.profiler.stop("decide", started)
+        return direction
+
+    # puts this tick's direction in the snake's user input queue like a key press does
+    def drive(self):
+        direction = self.decide()
+        if direction is not None and direction != self.snake.current_dir:
+            self.snake.user_dirs.appendleft(direction)
+        return direction
+
+    # counters and the profiler's summary of recent decision times (calls, mean, p50,
+    # p99 and max in milliseconds)
+    def stats(self):
+        summary = self.profiler.summary()
+        stats = summary["counters"]
+        if "decide" in summary["phases"]:
+            stats["decide"] = summary["phases"]["decide"]
+        return stats
+
+# autopilot of every game played with policy so each game keeps its own distance field
+autopilots = weakref.WeakKeyDictionary()
+
+# tournament policy that plays with an Autopilot (python tournament.py --policy autopilot:policy)
+def policy(game):
+    autopilot = autopilots.get(game)
+    if autopilot is None:
+        autopilot = autopilots[game] = Autopilot(game.snake, game.fruit, game.grid)
+    return autopilot.decide()
@@ -0,0 +1,195 @@
+import time
+import numpy as np
+
+from engine import Direction, StepResult
+
+# this module plays many games of snake at the same time with numpy. every game
+# follows the same rules as engine.Game, but instead of one python object per game
+# each part of the game state is an array with one row per game so that a single
+# step moves every snake at once
+
+# how many tiles the head moves in the x and y axis, indexed by Direction value
+STEP_X = np.array([0, 0, -1, 1], dtype=np.int32)
+STEP_Y = np.array([-1, 1, 0, 0], dtype=np.int32)
+# the direction the snake would go into itself from, indexed by Direction value
+OPPOSITE = np.array([Direction.DOWN.value, Direction.UP.value,
+                     Direction.RIGHT.value, Direction.LEFT.value], dtype=np.int8)
+
+# causes of death as they are stored in the cause array (0 means still alive)
+CAUSES = (None, "wall", "tail", "win")
+WALL = 1
+TAIL = 2
+WIN = 3
+
+class BatchGame():
+    # n is the number of games, grid is the number of tiles in the x and y axis
+    # and seed makes every game repeatable
+    def __init__(self, n, grid=(36, 24), seed=None):
+        self.n = n
+        self.grid = grid
+        self.rng = np.random.default_rng(seed)
+        cols, rows = grid
+        # a snake can never be longer than the board, plus one for the new head
+        self.capacity = cols * rows + 1
+        # index of every game, used to pick one element per row
+        self.games = np.arange(n)
+
+        # tile of each snake head
+        self.head_x = np.zeros(n, dtype=np.int32)
+        self.head_y = np.zeros(n, dtype=np.int32)
+        # direction of each snake as a Direction value
+        self.current_dir = np.zeros(n, dtype=np.int8)
+        # each row is a ring buffer of the tiles (y * cols + x) of a snake's body
+        # head_ptr is where the head is in the ring and the tail is length - 1 before it
+        self.body = np.zeros((n, self.capacity), dtype=np.int32)
+        self.head_ptr = np.zeros(n, dtype=np.int32)
+        self.length = np.zeros(n, dtype=np.int32)
+        # each row is true for every tile the snake is on
+        self.occupied = np.zeros((n, cols * rows), dtype=bool)
+        # number of ticks played and fruit eaten since the last reset
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+
+        # resets every snake to its default
+        self.reset(np.ones(n, dtype=bool))
+
+        # spawns a fruit for every game (-1 means there is no fruit because the board is full)
+        self.fruit_x = np.zeros(n, dtype=np.int32)
+        self.fruit_y = np.zeros(n, dtype=np.int32)
+        self.spawn(np.ones(n, dtype=bool))
+
+        # total number of single game ticks played and time spent playing them
+        self.total_steps = 0
+        self.total_time = 0.0
+
+    # resets the snakes of the selected games to a default position, size, and direction
+    def reset(self, mask):
+        cols, rows = self.grid
+        # the same default tile as engine.Snake
+        default_x = max(cols - 15, 0)
+        default_y = max(rows - 10, 0)
+
+        self.occupied[mask] = False
+        self.head_x[mask] = default_x
+        self.head_y[mask] = default_y
+        self.current_dir[mask] = Direction.RIGHT.value
+        self.head_ptr[mask] = 0
+        self.length[mask] = 1
+        self.body[mask, 0] = default_y * cols + default_x
+        self.occupied[mask, default_y * cols + default_x] = True
+        self.ticks[mask] = 0
+        self.score[mask] = 0
+
+    # creates a fruit at a random tile the snake isn't on for the selected games
+    # returns which of the selected games had no free tile left (the snake won)
+    def spawn(self, mask):
+        cols = self.grid[0]
+        free = ~self.occupied[mask]
+        # number of free tiles in each game and which of them to pick
+        free_count = free.sum(axis=1)
+        pick = (self.rng.random(len(free_count)) * free_count).astype(np.int64)
+        # the picked tile is the first one where the running count of free tiles passes pick
+        tile = np.argmax(np.cumsum(free, axis=1) > pick[:, None], axis=1)
+
+        full = free_count == 0
+        self.fruit_x[mask] = np.where(full, -1, tile % cols)
+        self.fruit_y[mask] = np.where(full, -1, tile // cols)
+        return full
+
+    # plays one tick of every game
+    # actions is an array of Direction values (or -1 to keep going straight) and
+    # directions that would go into the snake are ignored just like in engine.Game
+    # returns a StepResult of arrays where cause holds indexes into CAUSES
+    def step(self, actions=None):
+        start = time.perf_counter()
+        cols, rows = self.grid
+        games = self.games
+
+        # turn the snakes that were given a direction they can go in
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int8)
+            turning = (actions >= 0) & (actions != OPPOSITE[self.current_dir])
+            self.current_dir = np.where(turning, actions, self.current_dir)
+
+        # get the tile next to each head in its current direction
+        new_x = self.head_x + STEP_X[self.current_dir]
+        new_y = self.head_y + STEP_Y[self.current_dir]
+        self.head_x = new_x
+        self.head_y = new_y
+
+        # snakes that left the board die before touching anything
+        cause = np.zeros(self.n, dtype=np.int8)
+        wall = (new_x < 0) | (new_x >= cols) | (new_y < 0) | (new_y >= rows)
+        cause[wall] = WALL
+        inside = ~wall
+        # off board tiles are clipped so they can still be used as an index
+        new_tile = np.where(inside, new_y * cols + new_x, 0)
+
+        ate = inside & (new_x == self.fruit_x) & (new_y == self.fruit_y)
+
+        # snakes that didn't eat pop their tail before the head is checked, so a
+        # snake can move into the tile its tail is leaving like in engine.Snake
+        popping = inside & ~ate
+        tail_ptr = (self.head_ptr - self.length + 1) % self.capacity
+        tail_tile = self.body[games, tail_ptr]
+        self.occupied[games[popping], tail_tile[popping]] = False
+
+        # the head is colliding with the body if the new tile is still taken
+        tail = inside & self.occupied[games, new_tile]
+        cause[tail] = TAIL
+
+        # push the new head of every snake that is still alive
+        moving = inside & ~tail
+        moved = games[moving]
+        self.head_ptr[moving] = (self.head_ptr[moving] + 1) % self.capacity
+        self.body[moved, self.head_ptr[moving]] = new_tile[moving]
+        self.occupied[moved, new_tile[moving]] = True
+
+        # snakes that ate grow by 1 part and a new fruit spawns in their game
+        self.length[ate] += 1
+        self.score[ate] += 1
+        self.ticks += 1
+        if ate.any():
+            # a snake that filled the board has nowhere left for fruit so it won
+            won = ate.copy()
+            won[ate] = self.spawn(ate)
+            cause[won] = WIN
+
+        result = StepResult(ate, cause, self.score.copy(), self.length.copy())
+
+        # reset snakes to their default position and size when their game ended
+        dead = cause != 0
+        if dead.any():
+            self.reset(dead)
+            # games that were won need a new fruit
+            if (cause == WIN).any():
+                self.spawn(cause == WIN)
+
+        self.total_steps += self.n
+        self.total_time += time.perf_counter() - start
+        return result
+
+    # number of single game ticks played per second of time spent in step
+    def steps_per_second(self):
+        if self.total_time == 0:
+            return 0.0
+        return self.total_steps / self.total_time
+
+# plays random games and prints how fast they were played
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="plays many random games of snake at once")
+    parser.add_argument("--games", type=int, default=4096, help="number of games played at once")
+    parser.add_argument("--ticks", type=int, default=1000, help="number of ticks to play")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random number generator")
+    args = parser.parse_args()
+
+    batch = BatchGame(args.games, seed=args.seed)
+    deaths = 0
+    for _ in range(args.ticks):
+        # random direction for every game
+        result = batch.step(batch.rng.integers(0, 4, args.games))
+        deaths += int(np.count_nonzero(result.cause))
+
+    print(f"{batch.total_steps} steps, {deaths} deaths, {batch.steps_per_second():.0f} steps/sec")
@@ -0,0 +1,345 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+# draw to SDL's dummy video driver so the benchmarks run on machines without a display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import engine
+from engine import Direction
+import snake as game
+from arena import Arena
+
+# this module times the parts of the game that run every tick or frame at a few
+# snake lengths and board sizes. results can be saved as a JSON baseline and later
+# runs compared against it, failing if anything got slower than the threshold
+
+# board sizes and snake lengths to time, lengths that don't fit a board are skipped
+BOARDS = [(36, 24), (100, 100), (250, 250)]
+LENGTHS = [4, 256, 4096]
+
+# the direction from a tile to the tile next to it
+DIRECTION_TO = {step: direction for direction, step in engine.STEPS.items()}
+
+# builds a path through every tile of the grid that ends where it starts, so a snake
+# following it never hits a wall or itself. the first column is kept for going back
+# up and every other row goes right then left through the rest of the columns
+# (needs an even number of rows)
+def cycle(grid):
+    cols, rows = grid
+    path = []
+    for y in range(rows):
+        xs = range(1, cols) if y % 2 == 0 else range(cols - 1, 0, -1)
+        path.extend((x, y) for x in xs)
+    path.extend((0, y) for y in range(rows - 1, -1, -1))
+    return path
+
+# fruit that is moved in front of the snake by hand, or never reached if left alone
+class NoFruit():
+    def __init__(self):
+        self.fruit_pos = (-1, -1)
+
+    def spawn(self, grid):
+        self.fruit_pos = (-1, -1)
+
+# the direction to take from every tile of a grid to stay on its cycle, worked out
+# once per grid since every benchmark on that grid builds a new snake along it
+turns_cache = {}
+
+def cycle_turns(grid):
+    if grid not in turns_cache:
+        path = cycle(grid)
+        turns = {}
+        for i, tile in enumerate(path):
+            next_tile = path[(i + 1) % len(path)]
+            turns[tile] = DIRECTION_TO[(next_tile[0] - tile[0], next_tile[1] - tile[1])]
+        turns_cache[grid] = turns
+    return turns_cache[grid]
+
+# creates a snake of the given class and length lying along the cycle
+# returns the snake and the direction to take from every tile to stay on the cycle
+def make_snake(grid, length, snake_class=engine.Snake):
+    turns = cycle_turns(grid)
+
+    # every tile is on the cycle so the snake grows along it from its default head
+    # by putting fruit in front of it until it is long enough
+    snake = snake_class(grid)
+    fruit = NoFruit()
+    while len(snake) < length:
+        snake.current_dir = turns[snake.head()]
+        fruit.fruit_pos = snake.next_tile()
+        snake.move(fruit, grid)
+    snake.current_dir = turns[snake.head()]
+    # the pygame snake remembers every tile it changed until a renderer draws them
+    if hasattr(snake, "dirty"):
+        snake.dirty.clear()
+    return snake, turns
+
+# times a benchmark and returns how many calls it did per second. make builds fresh
+# state and returns a function that runs the benchmark a given number of times on it,
+# so no repeat runs on what an earlier one left behind. like timeit's autorange the
+# number of calls goes 1, 2, 5, 10, 20, 50... until a run takes at least min_time,
+# then that many are run repeat times and the best is kept (so a busy machine doesn't
+# make it look slower)
+def measure(make, repeat=5, min_time=0.2):
+    def timed(number):
+        func = make()
+        # like timeit the garbage collector is off while timing so a collection
+        # that happens to land in one run doesn't make it look slower
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(number)
+            return time.perf_counter() - start
+        finally:
+            gc.enable()
+
+    elapsed = 0
+    scale = 1
+    while elapsed < min_time:
+        for multiple in (1, 2, 5):
+            number = scale * multiple
+            elapsed = timed(number)
+            if elapsed >= min_time:
+                break
+        scale *= 10
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, timed(number))
+    return number / best if best > 0 else float("inf")
+
+# every benchmark for one board size and snake length, each builds its own snake
+# and returns how to run it a number of times. the engine's snake is timed for
+# everything but drawing so only the game logic is measured
+def benchmarks(grid, length, surface):
+    no_fruit = NoFruit()
+
+    def move():
+        snake, turns = make_snake(grid, length)
+
+        def run(number):
+            for _ in range(number):
+                snake.current_dir = turns[snake.head()]
+                snake.move(no_fruit, grid)
+        return run
+
+    def turn():
+        snake, turns = make_snake(grid, length)
+
+        def run(number):
+            for _ in range(number):
+                snake.user_dirs.appendleft(turns[snake.head()])
+                snake.turn(no_fruit, grid)
+        return run
+
+    def collides_with_tail():
+        snake, _ = make_snake(grid, length)
+
+        def run(number):
+            for _ in range(number):
+                snake.collides_with_tail()
+        return run
+
+    def spawn():
+        snake, _ = make_snake(grid, length)
+        fruit = engine.Fruit(grid, free_cells=snake.free_cells)
+
+        def run(number):
+            for _ in range(number):
+                fruit.spawn(grid)
+        return run
+
+    def draw():
+        snake, _ = make_snake(grid, length, game.Snake)
+
+        def run(number):
+            for _ in range(number):
+                snake.draw(surface)
+        return run
+
+    return {"move": move, "turn": turn, "collides_with_tail": collides_with_tail,
+            "spawn": spawn, "draw": draw}
+
+# benchmarks that don't depend on the snake's length
+def game_benchmarks(grid):
+    def game_step():
+        headless = engine.Game(grid, seed=0)
+
+        def run(number):
+            rng = headless.rng
+            for _ in range(number):
+                headless.step(rng.choice(engine.DIRECTIONS))
+        return run
+
+    # a game played through a History, and a move played and taken back like a
+    # search bot would, going straight so the random numbers are only used by fruit
+    def history_step():
+        remembered = engine.History(engine.Game(grid, seed=0), 4096)
+
+        def run(number):
+            for _ in range(number):
+                remembered.step()
+        return run
+
+    def step_rewind():
+        remembered = engine.History(engine.Game(grid, seed=0), 4096)
+
+        def run(number):
+            for _ in range(number):
+                remembered.step()
+                remembered.rewind()
+        return run
+
+    def clone():
+        headless = engine.Game(grid, seed=0)
+
+        def run(number):
+            for _ in range(number):
+                headless.clone()
+        return run
+
+    return {"game_step": game_step, "history_step": history_step, "step_rewind": step_rewind, "clone": clone}
+
+# ticks of an arena full of snakes going straight (the ones that die respawn)
+def arena_benchmarks(grid, snakes):
+    def arena_step():
+        arena = Arena(grid, snakes, snakes, seed=0)
+
+        def run(number):
+            for _ in range(number):
+                arena.step()
+        return run
+
+    return {"arena_step": arena_step}
+
+# renders frames of a game in a window for both render modes
+def render_benchmarks(grid):
+    window = pygame.display.set_mode((grid[0] * game.TILE, grid[1] * game.TILE))
+    no_fruit = NoFruit()
+    results = {}
+
+    for name, incremental in (("render_full", False), ("render_incremental", True)):
+        def render(incremental=incremental):
+            snake, turns = make_snake(grid, min(256, grid[0] * grid[1] // 2), game.Snake)
+            fruit = game.Fruit(grid, free_cells=snake.free_cells)
+            renderer = game.Renderer(incremental)
+
+            def run(number):
+                for _ in range(number):
+                    snake.current_dir = turns[snake.head()]
+                    snake.move(no_fruit, grid)
+                    renderer.draw(window, snake, fruit, 1.0)
+            return run
+
+        results[name] = render
+    return results
+
+# renders frames of a board much bigger than the window through the camera
+def viewport_benchmarks(grid):
+    window = pygame.display.set_mode(game.WINDOW)
+    no_fruit = NoFruit()
+
+    def render_viewport():
+        snake = game.Snake(grid)
+        fruit = game.Fruit(grid, free_cells=snake.free_cells)
+        renderer = game.make_renderer(grid, game.WINDOW)
+        # the snake starts near the right edge and goes left along a row so the camera
+        # keeps moving and new chunks keep coming into view
+        snake.current_dir = Direction.LEFT
+
+        def run(number):
+            for _ in range(number):
+                snake.move(no_fruit, grid)
+                if snake.out_of_bounds(grid):
+                    snake.reset(grid)
+                    snake.current_dir = Direction.LEFT
+                renderer.draw(window, snake, fruit, 0.5)
+        return run
+
+    return {"render_viewport": render_viewport}
+
+# runs every benchmark and returns how many per second each did by name
+# quick runs each for less time and fewer times so it finishes fast but is noisier
+def run(quick=False, only=None, output=sys.stdout):
+    pygame.init()
+    surface = pygame.Surface((BOARDS[-1][0] * game.TILE, BOARDS[-1][1] * game.TILE))
+    repeat, min_time = (3, 0.05) if quick else (5, 0.2)
+    results = {}
+
+    def record(name, make):
+        if only is not None and only not in name:
+            return
+        results[name] = measure(make, repeat, min_time)
+        print(f"{name:<40} {results[name]:>14,.0f} /sec", file=output)
+
+    for grid in BOARDS:
+        for length in LENGTHS:
+            if length >= grid[0] * grid[1]:
+                continue
+            for name, make in benchmarks(grid, length, surface).items():
+                record(f"{name}[{grid[0]}x{grid[1]},len={length}]", make)
+        for name, make in game_benchmarks(grid).items():
+            record(f"{name}[{grid[0]}x{grid[1]}]", make)
+
+    # every tick moves every snake in the arena
+    for snakes in (100, 1000):
+        for name, make in arena_benchmarks((250, 250), snakes).items():
+            record(f"{name}[250x250,snakes={snakes}]", make)
+
+    # rendering uses the default window size
+    for name, make in render_benchmarks((36, 24)).items():
+        record(f"{name}[36x24]", make)
+    # a huge board only ever draws what fits in the window
+    for name, make in viewport_benchmarks((10000, 10000)).items():
+        record(f"{name}[10000x10000]", make)
+
+    pygame.quit()
+    return results
+
+# compares results with a baseline and returns the names of benchmarks that got
+# more than threshold (i.e. 0.2 for 20%) slower
+def regressions(results, baseline, threshold):
+    slower = []
+    for name, rate in results.items():
+        if name in baseline and rate < baseline[name] * (1 - threshold):
+            slower.append(name)
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmarks the snake engine and renderer")
+    parser.add_argument("--save", default=None, help="file to save the results to as a baseline")
+    parser.add_argument("--compare", default=None, help="baseline file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="how much slower than the baseline (0.2 is 20%%) counts as a regression")
+    parser.add_argument("--quick", action="store_true", help="time each benchmark for less time and fewer repeats")
+    parser.add_argument("--only", default=None, help="only run benchmarks with this in their name")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.only)
+
+    if args.save is not None:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        slower = regressions(results, baseline, args.threshold)
+        for name in slower:
+            print(f"regression: {name} {results[name]:,.0f}/sec vs baseline {baseline[name]:,.0f}/sec")
+        if slower:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} against {args.compare}")
+
+    return 0
+
+# runs if we're running the script itself
+if __name__ == "__main__":
+    sys.exit(main())
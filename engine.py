@@ -0,0 +1,822 @@
+from enum import Enum
+from collections import deque, namedtuple
+from array import array
+import random
+import time
+
+from profiler import NullProfiler
+
+# this module holds all of the game rules with no pygame in it so that the game
+# can be simulated without a window (i.e. on servers or for testing bots).
+# positions here are in tiles rather than pixels, the pygame side of the game
+# converts tiles to pixels only when it draws
+
+# enum used to help in steering the snake
+class Direction(Enum):
+    UP = 0
+    DOWN = 1
+    LEFT = 2
+    RIGHT = 3
+
+# how many tiles the head moves in the x and y axis for each direction
+STEPS = {
+    Direction.UP: (0, -1),
+    Direction.DOWN: (0, 1),
+    Direction.LEFT: (-1, 0),
+    Direction.RIGHT: (1, 0),
+}
+
+# the direction the snake would go into itself from for each direction
+OPPOSITE = {
+    Direction.UP: Direction.DOWN,
+    Direction.DOWN: Direction.UP,
+    Direction.LEFT: Direction.RIGHT,
+    Direction.RIGHT: Direction.LEFT,
+}
+
+# every direction in a list in order of their values, so random choices are repeatable
+# and a direction's value (i.e. a byte from a recording or a client) is its index
+DIRECTIONS = list(Direction)
+
+# most turns a snake keeps in its user input queue before it has played them, more
+# than a few turns ahead can't be what the player meant and would play out far too late
+MAX_TURNS = 3
+
+# every attribute in the __slots__ of a class and the classes it comes from, worked out
+# once per class so copying an object is a loop over the names
+slot_names = {}
+
+# a new object of the same class with the same attributes, like copy.copy but without
+# going through pickling's __reduce_ex__ which is most of the time copy.copy takes
+def copy_slots(obj):
+    cls = type(obj)
+    names = slot_names.get(cls)
+    if names is None:
+        names = slot_names[cls] = tuple(name for klass in cls.__mro__ for name in getattr(klass, "__slots__", ()))
+    new = cls.__new__(cls)
+    for name in names:
+        setattr(new, name, getattr(obj, name))
+    return new
+
+# what a single tick of the game returns
+# ate is true if the snake ate a fruit this tick, cause is why the game ended
+# ("wall" or "tail" if the snake died, "win" if it filled the whole board) or None
+# if it is still going, and score and length are taken before the game resets so
+# they describe the snake that just finished
+StepResult = namedtuple("StepResult", ["ate", "cause", "score", "length"])
+
+class Snake():
+    # attributes are fixed so every snake is a small object without a __dict__
+    __slots__ = ("grid", "cells", "head_ptr", "length", "head_x", "head_y", "prev_head",
+                 "occupied", "free_cells", "current_dir", "user_dirs", "shared")
+
+    # initializes variables for snake
+    def __init__(self, grid):
+        # every tile the snake isn't on, so fruit can be spawned on a free tile
+        self.free_cells = FreeCells(grid)
+        self.grid = None
+        # the body and occupied tiles aren't shared with a copy of the snake (see copy)
+        self.shared = None
+        self.reset(grid) # resets snake to its default
+
+    # resets snake to a default position, size, and direction
+    def reset(self, grid):
+        if self.shared is not None:
+            self.unshare()
+        # the same board as before only needs the snake's own tiles freed up again
+        # instead of rebuilding every tile of the board
+        if grid == self.grid:
+            for tile in self.occupied:
+                self.free_cells.add(tile)
+        else:
+            self.free_cells.reset(grid)
+            # the body is a ring buffer of tile numbers (y * width + x), a 2 byte
+            # array is enough for boards up to 65536 tiles. it is made once and grows
+            # if the snake ever outgrows it, so moving never creates new objects
+            capacity = grid[0] * grid[1] + 1
+            self.cells = array("H" if capacity <= 65536 else "I", [0]) * min(capacity, 65536)
+        self.grid = grid
+
+        # x and y of the tile the snake head is on
+        # on the default 36x24 board this is the same spot as before (420, 280)
+        self.head_x = max(grid[0] - 15, 0)
+        self.head_y = max(grid[1] - 10, 0)
+        # tile the head was on before its last move, used to draw the head in between
+        self.prev_head = (self.head_x, self.head_y)
+        # the head is at head_ptr in the ring and the tail is length - 1 before it
+        self.head_ptr = 0
+        self.length = 1
+        head = self.head_y * grid[0] + self.head_x
+        self.cells[0] = head
+        # maps each occupied tile to how many body parts are on it
+        # this lets us answer collision and "is this tile free" questions in constant
+        # time instead of looping through the whole body every frame
+        self.occupied = {}
+        self.occupy(head)
+        # sets default direction to the right
+        self.current_dir = Direction.RIGHT
+        self.user_dirs = deque([])
+
+    # number of body parts
+    def __len__(self):
+        return self.length
+
+    # x and y of the tile the snake head is on
+    def head(self):
+        return (self.head_x, self.head_y)
+
+    # x and y of the tile the snake tail is on
+    def tail(self):
+        tile = self.cells[self.head_ptr - self.length + 1]
+        return (tile % self.grid[0], tile // self.grid[0])
+
+    # goes through the x and y of every body part from the head to the tail
+    def body(self):
+        cells = self.cells
+        capacity = len(cells)
+        width = self.grid[0]
+        ptr = self.head_ptr
+        for _ in range(self.length):
+            tile = cells[ptr]
+            yield (tile % width, tile // width)
+            ptr = ptr - 1 if ptr > 0 else capacity - 1
+
+    # comments apply for the turn and move functions
+    # instead of shifting every part of the snake by 1 position we can just
+    # add a new segment at the front with the next position and delete the
+    # last segment of the snake to mimic the snake moving
+
+    # every call moves the snake exactly one tile. how often they are called is up to
+    # a FixedTimestep so that the snake moves at the same speed no matter the fps and
+    # the same inputs always give the same game (rounding a position that moved by
+    # delta time could skip or repeat tiles when frames took too long)
+
+    # turns the snake within the grid
+    def turn(self, fruit, grid):
+        # set the current direction to the first direction in queue and remove from queue
+        self.current_dir = self.user_dirs.pop()
+        # move the head to the next tile in the new direction
+        return self.advance(self.next_tile(), fruit, grid)
+
+    # moves the snake within the grid
+    def move(self, fruit, grid):
+        # move the head to the next tile in the current direction
+        return self.advance(self.next_tile(), fruit, grid)
+
+    # moves the snake one tile like turn and move, if a direction is given it is used
+    # instead of the user input queue (it is ignored if it would go into the snake)
+    def step(self, fruit, grid, direction=None):
+        # use the given direction if the snake can go that way
+        if direction is not None:
+            if direction != OPPOSITE[self.current_dir]:
+                self.current_dir = direction
+        # otherwise use the first direction in the user input queue
+        elif len(self.user_dirs) > 0:
+            self.current_dir = self.user_dirs.pop()
+
+        # move the head to the next tile in the current direction
+        return self.advance(self.next_tile(), fruit, grid)
+
+    # puts a turn in the user input queue unless it wouldn't change anything (it is the
+    # same as or opposite to the last direction queued) or the queue is full
+    # returns true if the turn was queued
+    def queue_turn(self, direction):
+        user_dirs = self.user_dirs
+        last = user_dirs[0] if user_dirs else self.current_dir
+        if direction == last or direction == OPPOSITE[last] or len(user_dirs) >= MAX_TURNS:
+            return False
+        user_dirs.appendleft(direction)
+        return True
+
+    # gets the tile next to the head in the current direction
+    def next_tile(self):
+        step_x, step_y = STEPS[self.current_dir]
+        return (self.head_x + step_x, self.head_y + step_y)
+
+    # puts a new head on the given tile and eats or pops the tail
+    # returns true if the snake ate a fruit
+    def advance(self, new_part_pos, fruit, grid):
+        # remember where the head was so drawing can slide it to the new tile
+        self.prev_head = (self.head_x, self.head_y)
+        # x and y of the head tile
+        head_x, head_y = self.head_x, self.head_y = new_part_pos
+
+        # a head that left the board isn't put in the body, the snake is dead anyway
+        width = grid[0]
+        if head_x < 0 or head_x >= width or head_y < 0 or head_y >= grid[1]:
+            return False
+
+        if self.shared is not None:
+            self.unshare()
+        # the ring is full so it needs to grow before the new head fits
+        cells = self.cells
+        if self.length == len(cells):
+            cells = self.grow()
+        # put the new head in front of the old one in the ring
+        # the new body part is the new head of the snake
+        ptr = self.head_ptr + 1
+        if ptr == len(cells):
+            ptr = 0
+        self.head_ptr = ptr
+        tile = head_y * width + head_x
+        cells[ptr] = tile
+        self.length += 1
+        # mark the new head's tile as occupied
+        self.occupy(tile)
+
+        # after moving check if the head of snake is not touching food
+        if not self.collides_with_food(fruit):
+            # since there is no food, we pop the last segment of the snake
+            # and free up the tile it was on
+            self.length -= 1
+            self.vacate(cells[ptr - self.length])
+            return False
+
+        # note we don't pop here since the snake should grow by 1 part from eating
+        # eat fruit and spawn new fruit
+        fruit.spawn(grid)
+        return True
+
+    # takes back one move, the exact opposite of advance. pushed is true if the move
+    # put a new head in the ring, popped is the tail tile it popped (None if it didn't)
+    # and where is where that tile was in the free tiles before the move (see
+    # FreeCells.index). free tiles go back to the same order they were in so fruit
+    # spawns the same way if the same moves are played again
+    def undo(self, pushed, popped, where=None):
+        if self.shared is not None:
+            self.unshare()
+        cells = self.cells
+        # put the tail back behind the last body part, there is room since the ring
+        # held the new head and the tail during the move
+        if popped is not None:
+            cells[self.head_ptr - self.length] = popped
+            self.length += 1
+            count = self.occupied.get(popped, 0)
+            self.occupied[popped] = count + 1
+            if count == 0:
+                self.free_cells.undo_add(popped, where)
+        # take the head off the front of the ring
+        if pushed:
+            tile = cells[self.head_ptr]
+            self.head_ptr = self.head_ptr - 1 if self.head_ptr > 0 else len(cells) - 1
+            self.length -= 1
+            count = self.occupied[tile] - 1
+            if count == 0:
+                del self.occupied[tile]
+                self.free_cells.undo_remove(tile)
+            else:
+                self.occupied[tile] = count
+
+    # keeps what undo_reset needs to take back a reset, called just before the reset:
+    # the body from the tail to the head, the tiles it is on and where each of those
+    # tiles was in the free tiles when it was taken. it costs the length of the snake
+    def before_reset(self):
+        tiles = array(self.cells.typecode, (self.cells[self.head_ptr - i] for i in range(self.length - 1, -1, -1)))
+        wheres = [self.free_cells.index(tile) for tile in self.occupied]
+        return (tiles, dict(self.occupied), wheres)
+
+    # takes back a reset with what before_reset kept. the free tiles are put back in
+    # the same order by undoing what the reset did to them in the opposite order
+    def undo_reset(self, saved):
+        tiles, occupied, wheres = saved
+        if self.shared is not None:
+            self.unshare()
+        free_cells = self.free_cells
+        for tile in reversed(list(self.occupied)):
+            free_cells.undo_remove(tile)
+        for tile, where in zip(reversed(list(occupied)), reversed(wheres)):
+            free_cells.undo_add(tile, where)
+        self.cells[:len(tiles)] = tiles
+        self.head_ptr = len(tiles) - 1
+        self.length = len(tiles)
+        self.occupied = occupied
+
+    # a snake in the same state that can be moved without changing this one. the body
+    # and occupied tiles (and the free tiles, see FreeCells.copy) are shared until one of
+    # the snakes changes them, so copying costs the same however long the snake is and
+    # copies that are only looked at never copy their body at all. shared is a list
+    # holding the number of snakes sharing them, the same list for all of them
+    def copy(self):
+        snake = copy_slots(self)
+        if self.shared is None:
+            self.shared = [1]
+        self.shared[0] += 1
+        snake.shared = self.shared
+        snake.free_cells = self.free_cells.copy()
+        snake.user_dirs = deque(self.user_dirs)
+        return snake
+
+    # gives the snake its own body and occupied tiles before it changes them, the last
+    # snake still sharing them keeps them as they are
+    def unshare(self):
+        shared = self.shared
+        shared[0] -= 1
+        if shared[0] > 0:
+            self.cells = self.cells[:]
+            self.occupied = dict(self.occupied)
+        self.shared = None
+
+    # doubles the size of the ring, putting the tail at the start of the new one
+    def grow(self):
+        cells = self.cells
+        tail = self.head_ptr - self.length + 1
+        # a negative tail counts back from the end of the ring
+        ordered = cells[tail:] + cells[:self.head_ptr + 1] if tail < 0 else cells[tail:self.head_ptr + 1]
+        self.cells = ordered + array(cells.typecode, [0]) * len(ordered)
+        self.head_ptr = self.length - 1
+        return self.cells
+
+    # goes through the x and y of every body part inside a rectangle of tiles (right
+    # and bottom not included). it looks through whichever is smaller, the body or the
+    # rectangle, so finding the parts on screen stays cheap on huge boards and long snakes
+    def parts_in(self, left, top, right, bottom):
+        width, height = self.grid
+        left, top = max(left, 0), max(top, 0)
+        right, bottom = min(right, width), min(bottom, height)
+        if right <= left or bottom <= top:
+            return
+        if self.length <= (right - left) * (bottom - top):
+            for x, y in self.body():
+                if left <= x < right and top <= y < bottom:
+                    yield (x, y)
+        else:
+            occupied = self.occupied
+            for y in range(top, bottom):
+                row = y * width
+                for x in range(left, right):
+                    if row + x in occupied:
+                        yield (x, y)
+
+    # checks if snake is touching food
+    def collides_with_food(self, fruit):
+        # check if the snake head is touching food
+        fruit_pos = fruit.fruit_pos
+        return fruit_pos is not None and fruit_pos[0] == self.head_x and fruit_pos[1] == self.head_y
+
+    # check if the snake is out of bounds
+    def out_of_bounds(self, grid):
+        # check if snake is out of bounds in the x or y direction
+        return self.head_x < 0 or self.head_x >= grid[0] or self.head_y < 0 or self.head_y >= grid[1]
+
+    # marks a tile (y * width + x) as having one more body part on it
+    def occupy(self, tile):
+        count = self.occupied.get(tile, 0)
+        self.occupied[tile] = count + 1
+        # the tile was free until now
+        if count == 0:
+            self.free_cells.remove(tile)
+
+    # marks a tile (y * width + x) as having one less body part on it
+    def vacate(self, tile):
+        # get how many body parts are left on the tile
+        count = self.occupied[tile] - 1
+        # remove the tile entirely once nothing is on it so the dictionary
+        # only ever holds as many tiles as the snake is long
+        if count == 0:
+            del self.occupied[tile]
+            # the tile is free again
+            self.free_cells.add(tile)
+        else:
+            self.occupied[tile] = count
+
+    # checks if no part of the snake is on the tile at the given position
+    def is_free(self, pos):
+        x, y = pos
+        width = self.grid[0]
+        # tiles off the board are never part of the snake
+        if x < 0 or x >= width or y < 0 or y >= self.grid[1]:
+            return True
+        return y * width + x not in self.occupied
+
+    # check if snake collides with itself
+    def collides_with_tail(self):
+        head_x, head_y = self.head_x, self.head_y
+        width, height = self.grid
+        # a head off the board can't be on top of the body
+        if head_x < 0 or head_x >= width or head_y < 0 or head_y >= height:
+            return False
+        # the head is colliding with the body if some other body part shares its tile
+        # note that this also covers a snake that is only a head since its count is 1
+        return self.occupied[head_y * width + head_x] > 1
+
+# boards with more tiles than this don't keep a list of every free tile (it would take
+# gigabytes on a 10000x10000 board), they only keep the taken tiles and pick a free
+# tile by trying random tiles until one is free. that takes about one try as long as
+# most of the board is free, which is always the case on boards that big
+DENSE_LIMIT = 1 << 20
+
+# every tile of the grid that no part of the snake is on. the tiles are kept in a list
+# in no particular order along with where each tile is in that list, so a tile can be
+# removed by swapping the last tile into its place. adding, removing and picking a
+# random free tile never depend on the size of the board or the length of the snake
+class FreeCells():
+    __slots__ = ("grid", "count", "dense", "cells", "where", "taken", "shared")
+
+    # initializes the free tiles of the grid
+    def __init__(self, grid):
+        self.reset(grid)
+
+    # makes every tile of the grid free
+    def reset(self, grid):
+        self.grid = grid
+        # new tiles aren't shared with any copy (see copy)
+        self.shared = None
+        # tiles are stored as one number (y * width + x) to keep the arrays small
+        self.count = grid[0] * grid[1]
+        self.dense = self.count <= DENSE_LIMIT
+        if self.dense:
+            # arrays of 2 byte numbers (4 on boards over 65536 tiles) like the snake's
+            # body instead of lists of 8 byte pointers to ints
+            typecode = "H" if self.count <= 65536 else "I"
+            # the free tiles
+            self.cells = array(typecode, range(self.count))
+            # where each tile is in cells (only meaningful while the tile is free)
+            self.where = array(typecode, range(self.count))
+            self.taken = None
+        else:
+            self.cells = None
+            self.where = None
+            # the tiles that aren't free
+            self.taken = set()
+
+    # number of free tiles
+    def __len__(self):
+        if self.dense:
+            return len(self.cells)
+        return self.count - len(self.taken)
+
+    # checks if a tile (y * width + x) is free
+    def __contains__(self, tile):
+        if not self.dense:
+            return tile not in self.taken
+        index = self.where[tile]
+        return index < len(self.cells) and self.cells[index] == tile
+
+    # marks a tile (y * width + x) as taken
+    def remove(self, tile):
+        if self.shared is not None:
+            self.unshare()
+        if not self.dense:
+            self.taken.add(tile)
+            return
+        if tile not in self:
+            return
+        index = self.where[tile]
+        # move the last free tile into the removed tile's place
+        last = self.cells.pop()
+        if last != tile:
+            self.cells[index] = last
+            self.where[last] = index
+
+    # marks a tile (y * width + x) as free
+    def add(self, tile):
+        if self.shared is not None:
+            self.unshare()
+        if not self.dense:
+            self.taken.discard(tile)
+            return
+        if tile in self:
+            return
+        self.where[tile] = len(self.cells)
+        self.cells.append(tile)
+
+    # where a tile is in the list of free tiles, or None on boards that don't keep one
+    # a taken tile keeps where it was when it was taken until it is added again
+    def index(self, tile):
+        return self.where[tile] if self.dense else None
+
+    # takes back remove(tile), putting the tile and the tile moved into its place back
+    # where they were. the tile must be the last one removed that hasn't been undone
+    def undo_remove(self, tile):
+        if self.shared is not None:
+            self.unshare()
+        if not self.dense:
+            self.taken.discard(tile)
+            return
+        cells = self.cells
+        index = self.where[tile]
+        # the tile was the last free tile so nothing was moved
+        if index == len(cells):
+            cells.append(tile)
+            return
+        last = cells[index]
+        self.where[last] = len(cells)
+        cells.append(last)
+        cells[index] = tile
+
+    # takes back add(tile), where is index(tile) from before it was added
+    def undo_add(self, tile, where):
+        if self.shared is not None:
+            self.unshare()
+        if not self.dense:
+            self.taken.add(tile)
+            return
+        self.cells.pop()
+        self.where[tile] = where
+
+    # free tiles in the same order that can be changed without changing these. like
+    # Snake.copy the tiles are shared until either of them changes
+    def copy(self):
+        free_cells = copy_slots(self)
+        if self.shared is None:
+            self.shared = [1]
+        self.shared[0] += 1
+        free_cells.shared = self.shared
+        return free_cells
+
+    # gives these free tiles their own tiles before they change
+    def unshare(self):
+        shared = self.shared
+        shared[0] -= 1
+        if shared[0] > 0:
+            if self.dense:
+                self.cells = self.cells[:]
+                self.where = self.where[:]
+            else:
+                self.taken = set(self.taken)
+        self.shared = None
+
+    # picks a random free tile and returns its x and y
+    def choice(self, rng):
+        if self.dense:
+            tile = self.cells[rng.randrange(len(self.cells))]
+        else:
+            tile = rng.randrange(self.count)
+            while tile in self.taken:
+                tile = rng.randrange(self.count)
+        return (tile % self.grid[0], tile // self.grid[0])
+
+class Fruit():
+    # attributes are fixed so every fruit is a small object without a __dict__
+    __slots__ = ("rng", "free_cells", "fruit_pos")
+
+    # initialize variables for fruit
+    # rng is the random number generator used to place fruit, passing a seeded
+    # random.Random makes the fruit spawn in the same places every game
+    # free_cells is the snake's FreeCells so fruit never spawns inside the snake
+    def __init__(self, grid, rng=None, free_cells=None):
+        self.rng = rng if rng is not None else random.Random()
+        self.free_cells = free_cells
+        self.spawn(grid) # spawns a new fruit
+
+    # creates a fruit at a random location
+    # fruit_pos is None if there is nowhere left to put it (the snake won)
+    def spawn(self, grid):
+        # without free tiles any tile can be picked, even ones the snake is on
+        if self.free_cells is None:
+            # tuple that calculates random tile of fruit
+            self.fruit_pos = (self.rng.randint(0, grid[0] - 1), self.rng.randint(0, grid[1] - 1))
+        # the snake is on every tile of the board
+        elif len(self.free_cells) == 0:
+            self.fruit_pos = None
+        else:
+            self.fruit_pos = self.free_cells.choice(self.rng)
+
+    # a fruit in the same place that spawns with the given random number generator and free tiles
+    def copy(self, rng, free_cells):
+        fruit = copy_slots(self)
+        fruit.rng = rng
+        fruit.free_cells = free_cells
+        return fruit
+
+# random number generator that counts how many times it was used, so a snapshot can
+# tell its state hasn't changed since the last one and share that state instead of
+# copying it again (the state is 625 numbers but fruit only spawns every so often)
+class TrackedRandom(random.Random):
+    draws = 0
+
+    def seed(self, *args, **kwargs):
+        self.draws += 1
+        super().seed(*args, **kwargs)
+
+    def random(self):
+        self.draws += 1
+        return super().random()
+
+    def getrandbits(self, k):
+        self.draws += 1
+        return super().getrandbits(k)
+
+    def setstate(self, state):
+        self.draws += 1
+        super().setstate(state)
+
+    # a generator in the same state, made without seeding it first since the state
+    # is replaced right away anyway
+    def copy(self):
+        rng = type(self).__new__(type(self))
+        rng.setstate(self.getstate())
+        return rng
+
+# a whole game of snake that can be played one tick at a time without a window
+class Game():
+    # grid is the number of tiles in the x and y axis and seed makes the game repeatable
+    # if auto_reset is true the snake starts over after dying like in the windowed game
+    # snake_class and fruit_class can be the pygame versions so the game can be drawn
+    # profiler is a profiler.Profiler to time the collision checks of every step as the
+    # "collision" phase (a NullProfiler that records nothing by default)
+    def __init__(self, grid=(36, 24), seed=None, auto_reset=True, snake_class=Snake, fruit_class=Fruit,
+                 profiler=None):
+        self.grid = grid
+        self.profiler = profiler if profiler is not None else NullProfiler()
+        self.seed = seed
+        self.auto_reset = auto_reset
+        # every random choice in the game comes from this so the seed decides the whole game
+        self.rng = TrackedRandom(seed)
+        self.snake = snake_class(grid)
+        self.fruit = fruit_class(grid, self.rng, self.snake.free_cells)
+        # number of ticks played and fruit eaten since the last reset
+        self.ticks = 0
+        self.score = 0
+
+    # resets snake to its default position and size (the fruit stays where it is)
+    def reset(self):
+        self.snake.reset(self.grid)
+        # the last game was won so there was no fruit left
+        if self.fruit.fruit_pos is None:
+            self.fruit.spawn(self.grid)
+        self.ticks = 0
+        self.score = 0
+
+    # plays one tick of the game with the given direction (or the user input queue if None)
+    def step(self, action=None):
+        snake = self.snake
+        ate = snake.step(self.fruit, self.grid, action)
+        self.ticks += 1
+        if ate:
+            self.score += 1
+
+        # checks if the snake is out of bounds or colliding with itself
+        collision_started = self.profiler.start()
+        cause = None
+        if snake.out_of_bounds(self.grid):
+            cause = "wall"
+        elif snake.collides_with_tail():
+            cause = "tail"
+        # there was nowhere to spawn the next fruit
+        elif self.fruit.fruit_pos is None:
+            cause = "win"
+        self.profiler.stop("collision", collision_started)
+
+        result = StepResult(ate, cause, self.score, len(snake))
+
+        # reset snake to its default position and size
+        if cause is not None and self.auto_reset:
+            self.reset()
+
+        return result
+
+    # a game in the same state that can be played without changing this one, i.e. to
+    # try out moves. use a History to try moves and take them back on the same game
+    def clone(self):
+        game = object.__new__(type(self))
+        game.__dict__.update(self.__dict__)
+        game.rng = self.rng.copy()
+        game.snake = self.snake.copy()
+        game.fruit = self.fruit.copy(game.rng, game.snake.free_cells)
+        return game
+
+# the state of a game before a tick and what the tick changed, kept by History
+# pushed is true if the tick put a new head in the body, popped is the tail tile it
+# popped (or None) and where is where that tile was in the free tiles. body is what
+# Snake.before_reset kept if the tick reset the snake.
+# rng_state is shared by every snapshot taken while the random numbers weren't used
+Snapshot = namedtuple("Snapshot", ["ticks", "score", "head", "prev_head", "current_dir", "user_dirs",
+                                   "fruit_pos", "rng_state", "pushed", "popped", "where", "body"])
+
+# plays a game and remembers the last size ticks so they can be taken back. only
+# what a tick changed is kept (a head and a tail tile and the few other values of the
+# game) instead of a copy of the whole game, so remembering a tick costs the same
+# however long the snake is and rewinding costs the same per tick. search bots can
+# play a move with step and take it back with rewind instead of cloning the game
+class History():
+    # game is the game to play, it should only be played through step from now on
+    def __init__(self, game, size=1024):
+        self.game = game
+        self.snapshots = deque(maxlen=size)
+        # resets are played here instead of in Game.step so the body can be kept first
+        self.auto_reset = game.auto_reset
+        game.auto_reset = False
+        # the last random number generator state saved and how many times it had been
+        # used then (None if it doesn't count, then the state is saved every tick)
+        self.rng_state = None
+        self.rng_draws = None
+
+    # number of ticks that can be taken back
+    def __len__(self):
+        return len(self.snapshots)
+
+    # the state of the random number generator, only copied if it was used since the last time
+    def rng_snapshot(self):
+        rng = self.game.rng
+        draws = getattr(rng, "draws", None)
+        if draws is None or draws != self.rng_draws or self.rng_state is None:
+            self.rng_state = rng.getstate()
+            self.rng_draws = draws
+        return self.rng_state
+
+    # plays one tick like Game.step and remembers it
+    def step(self, action=None):
+        game = self.game
+        snake = game.snake
+        ticks, score = game.ticks, game.score
+        head, prev_head = (snake.head_x, snake.head_y), snake.prev_head
+        current_dir, user_dirs = snake.current_dir, tuple(snake.user_dirs)
+        fruit_pos, rng_state = game.fruit.fruit_pos, self.rng_snapshot()
+        head_ptr, length = snake.head_ptr, snake.length
+        tail = snake.cells[head_ptr - length + 1]
+        where = snake.free_cells.index(tail)
+
+        result = game.step(action)
+
+        # the head only stays put in the ring when it went off the board (growing the
+        # ring moves it too, but only to make room for a new head)
+        pushed = snake.head_ptr != head_ptr
+        popped = tail if pushed and snake.length == length else None
+        body = None
+        if result.cause is not None and self.auto_reset:
+            body = snake.before_reset()
+            game.reset()
+
+        self.snapshots.append(Snapshot(ticks, score, head, prev_head, current_dir, user_dirs,
+                                       fruit_pos, rng_state, pushed, popped, where, body))
+        return result
+
+    # takes back the last ticks (as many as are remembered) and returns how many were
+    # taken back. playing the same actions again plays out exactly the same
+    def rewind(self, ticks=1):
+        ticks = min(ticks, len(self.snapshots))
+        if ticks == 0:
+            return 0
+        snake = self.game.snake
+        for _ in range(ticks):
+            snapshot = self.snapshots.pop()
+            if snapshot.body is not None:
+                snake.undo_reset(snapshot.body)
+            snake.undo(snapshot.pushed, snapshot.popped, snapshot.where)
+        self.restore(snapshot)
+        return ticks
+
+    # puts back everything but the body from the snapshot of the earliest tick taken back
+    def restore(self, snapshot):
+        game = self.game
+        snake = game.snake
+        game.ticks, game.score = snapshot.ticks, snapshot.score
+        snake.head_x, snake.head_y = snapshot.head
+        snake.prev_head = snapshot.prev_head
+        snake.current_dir = snapshot.current_dir
+        snake.user_dirs.clear()
+        snake.user_dirs.extend(snapshot.user_dirs)
+        game.fruit.fruit_pos = snapshot.fruit_pos
+        # the random numbers are only put back if they were used since
+        rng = game.rng
+        if snapshot.rng_state is not self.rng_state or getattr(rng, "draws", None) != self.rng_draws:
+            rng.setstate(snapshot.rng_state)
+            self.rng_state = snapshot.rng_state
+            self.rng_draws = getattr(rng, "draws", None)
+
+# decides how many ticks of the game to play each frame so that the game plays at
+# exactly hz ticks per second no matter how fast frames are drawn. time that hasn't
+# added up to a whole tick yet is kept for the next frame, and alpha says how far
+# into the next tick we are so drawing can show the snake in between two tiles
+class FixedTimestep():
+    # hz is the number of ticks per second and max_ticks is the most ticks a single
+    # frame can play to catch up after a slow frame (the rest of the lag is dropped)
+    def __init__(self, hz=12, max_ticks=5, clock=time.perf_counter_ns):
+        self.max_ticks = max_ticks
+        self.clock = clock
+        self.set_hz(hz)
+        self.reset()
+
+    # changes the number of ticks per second
+    def set_hz(self, hz):
+        self.hz = hz
+        # length of a tick in nanoseconds, whole numbers so no time is lost to rounding
+        self.tick_ns = round(1000000000 / hz)
+
+    # forgets any time that built up, i.e. after the game was paused
+    def reset(self):
+        self.prev_time = self.clock()
+        self.accumulator = 0
+        # number of ticks that were dropped because frames fell too far behind
+        self.dropped = 0
+
+    # adds the time since the last call and returns how many ticks to play now
+    def ticks(self):
+        curr_time = self.clock()
+        self.accumulator += curr_time - self.prev_time
+        self.prev_time = curr_time
+
+        # play every whole tick that built up
+        ticks, self.accumulator = divmod(self.accumulator, self.tick_ns)
+        # too far behind to catch up so we drop the extra ticks instead of
+        # playing a burst of them that would make the snake jump across the board
+        if ticks > self.max_ticks:
+            self.dropped += ticks - self.max_ticks
+            ticks = self.max_ticks
+
+        return ticks
+
+    # how far (from 0 to 1) we are between the last tick and the next one
+    def alpha(self):
+        return self.accumulator / self.tick_ns
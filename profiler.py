@@ -0,0 +1,152 @@
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import deque
+
+# this module measures how long each part of a frame takes without printing every
+# frame. it is off by default, a NullProfiler is used instead which does nothing so
+# leaving the calls in the game loop costs almost nothing. it can be turned on with
+# the SNAKE_PROFILE environment variable or the --profile flag of snake.py
+
+# how many of the most recent times are kept for each phase to work out percentiles
+WINDOW = 10000
+
+# upper bounds (in milliseconds) of the histogram buckets every phase's times are counted
+# in, with one more bucket for anything slower. they are fixed so histograms from
+# different runs can be compared bucket by bucket (16 and 33 are a frame at 60 and 30 fps)
+BUCKETS_MS = (0.5, 1, 2, 4, 8, 16, 33, 50, 100)
+# the same bounds in nanoseconds for comparing with the recorded times
+BUCKETS_NS = [round(bound * 1e6) for bound in BUCKETS_MS]
+
+# profiler that records nothing, used when profiling is off
+class NullProfiler():
+    enabled = False
+
+    # gets the time a phase started
+    def start(self):
+        return 0
+
+    # records how long a phase took since start
+    def stop(self, phase, started):
+        pass
+
+    # adds to a counter
+    def count(self, counter, amount=1):
+        pass
+
+    # prints a summary if enough time has passed since the last one
+    def report(self):
+        pass
+
+    # writes every recorded time and counter to a JSON file
+    def dump(self, path=None):
+        pass
+
+class Profiler():
+    enabled = True
+
+    # interval is how many seconds apart summaries are printed (None to never print them)
+    # and dump_path is the JSON file dump writes to if it isn't given a path
+    def __init__(self, interval=5.0, dump_path=None, output=sys.stdout):
+        self.interval = interval
+        self.dump_path = dump_path
+        self.output = output
+        # the most recent times (in nanoseconds) of each phase
+        self.times = {}
+        # total time and number of times each phase was recorded since the start
+        self.totals = {}
+        self.calls = {}
+        # number of times of each phase in each of the BUCKETS_MS since the start
+        self.buckets = {}
+        # number of ticks, moves, etc.
+        self.counters = {}
+        self.started = time.perf_counter_ns()
+        self.last_report = self.started
+
+    # gets the time a phase started
+    def start(self):
+        return time.perf_counter_ns()
+
+    # records how long a phase took since start
+    def stop(self, phase, started):
+        elapsed = time.perf_counter_ns() - started
+        times = self.times.get(phase)
+        if times is None:
+            times = self.times[phase] = deque(maxlen=WINDOW)
+            self.totals[phase] = 0
+            self.calls[phase] = 0
+            self.buckets[phase] = [0] * (len(BUCKETS_NS) + 1)
+        times.append(elapsed)
+        self.totals[phase] += elapsed
+        self.calls[phase] += 1
+        # a time equal to a bound goes in that bound's bucket
+        self.buckets[phase][bisect_left(BUCKETS_NS, elapsed)] += 1
+
+    # adds to a counter
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    # counts of a phase's times by the upper bound of their bucket in milliseconds
+    # ("inf" for the times slower than every bound), since the start
+    def histogram(self, phase):
+        bounds = [str(bound) for bound in BUCKETS_MS] + ["inf"]
+        return dict(zip(bounds, self.buckets[phase]))
+
+    # works out the p50, p99 and max (in milliseconds) of the recent times of each phase
+    # along with a histogram of all of its times
+    def summary(self):
+        phases = {}
+        for phase, times in self.times.items():
+            recent = sorted(times)
+            phases[phase] = {
+                "calls": self.calls[phase],
+                "mean_ms": self.totals[phase] / self.calls[phase] / 1e6,
+                "p50_ms": recent[len(recent) // 2] / 1e6,
+                "p99_ms": recent[min(len(recent) - 1, len(recent) * 99 // 100)] / 1e6,
+                "max_ms": recent[-1] / 1e6,
+                "histogram_ms": self.histogram(phase),
+            }
+        return {
+            "seconds": (time.perf_counter_ns() - self.started) / 1e9,
+            "phases": phases,
+            "counters": dict(self.counters),
+        }
+
+    # prints a summary if enough time has passed since the last one
+    def report(self):
+        if self.interval is None:
+            return
+        now = time.perf_counter_ns()
+        if now - self.last_report < self.interval * 1e9:
+            return
+        self.last_report = now
+
+        summary = self.summary()
+        lines = [f"profile after {summary['seconds']:.1f}s"]
+        for phase, stats in summary["phases"].items():
+            lines.append(f"  {phase:<10} p50 {stats['p50_ms']:.3f}ms  p99 {stats['p99_ms']:.3f}ms  "
+                         f"max {stats['max_ms']:.3f}ms  ({stats['calls']} calls)")
+        counters = ", ".join(f"{counter} {amount}" for counter, amount in summary["counters"].items())
+        if counters:
+            lines.append(f"  {counters}")
+        print("\n".join(lines), file=self.output)
+
+    # writes the summary to a JSON file
+    def dump(self, path=None):
+        path = path if path is not None else self.dump_path
+        if path is None:
+            return
+        with open(path, "w") as dump_file:
+            json.dump(self.summary(), dump_file, indent=2)
+
+# creates a profiler if profiling is turned on by the argument or the SNAKE_PROFILE
+# environment variable (and SNAKE_PROFILE_JSON for where to dump it), or a NullProfiler if not
+def make_profiler(enabled=False, dump_path=None, interval=5.0):
+    enabled = enabled or os.environ.get("SNAKE_PROFILE", "") not in ("", "0")
+    if not enabled:
+        return NullProfiler()
+    if dump_path is None:
+        dump_path = os.environ.get("SNAKE_PROFILE_JSON")
+    return Profiler(interval, dump_path)
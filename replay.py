@@ -0,0 +1,193 @@
+import argparse
+import mmap
+from bisect import bisect_right
+import struct
+import sys
+import time
+
+import engine
+from engine import DIRECTIONS
+
+# this module records games so they can be played back exactly. every random choice
+# in a game comes from its seed, so a recording only needs the seed and the direction
+# the snake moved each tick. directions are stored 2 bits each with how many ticks in
+# a row the snake went that way in the other 6 bits of the same byte, so a snake
+# going straight for 64 ticks takes a single byte
+
+# file starts with "SNKR", the format version, the seed, the grid width and height
+# and the number of ticks per second the game was played at
+HEADER = struct.Struct("<4sBQHHH")
+MAGIC = b"SNKR"
+VERSION = 1
+# the seed is stored as an 8 byte unsigned number so only seeds below this can be recorded
+MAX_SEED = 2 ** 64
+# most ticks a single byte can hold
+MAX_RUN = 64
+# the tick every this many bytes of directions starts at is kept in an index, so going
+# to a tick reads at most this many bytes instead of every byte before it
+INDEX_STEP = 4096
+
+# writes the direction of every tick of a game to a file as it is played
+class Recorder():
+    # path is the file to write to, seed and grid are the game's and hz is how
+    # many ticks per second the game is played at
+    def __init__(self, path, seed, grid, hz=12):
+        if not 0 <= seed < MAX_SEED:
+            raise ValueError(f"only seeds from 0 to {MAX_SEED - 1} can be recorded, got {seed}")
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, grid[0], grid[1], hz))
+        # the direction of the current run of ticks and how long it is
+        self.direction = None
+        self.run = 0
+        self.ticks = 0
+
+    # records the direction the snake moved this tick
+    def record(self, direction):
+        self.ticks += 1
+        # carry on the current run
+        if direction is self.direction and self.run < MAX_RUN:
+            self.run += 1
+            return
+        # start a new run
+        self.write_run()
+        self.direction = direction
+        self.run = 1
+
+    # writes the current run as a single byte
+    def write_run(self):
+        if self.run > 0:
+            self.file.write(bytes(((self.direction.value << 6) | (self.run - 1),)))
+
+    # writes the last run and closes the file
+    def close(self):
+        self.write_run()
+        self.run = 0
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# reads a recording. the file is memory mapped so long recordings are only read
+# from disk as they are played instead of being loaded all at once
+class Replay():
+    # path is the recording to read
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.seed, width, height, self.hz = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snake recording")
+        if version != VERSION:
+            raise ValueError(f"{path} is recording version {version}, only version {VERSION} can be read")
+        self.grid = (width, height)
+        # the tick each INDEX_STEP bytes of directions starts at and the number of
+        # ticks in the recording, worked out the first time they are needed
+        self.index = None
+        self.ticks = None
+
+    # reads the whole recording once to build the index and count its ticks
+    def build_index(self):
+        data = self.data
+        self.index = []
+        tick = 0
+        for offset in range(HEADER.size, len(data), INDEX_STEP):
+            self.index.append(tick)
+            chunk = data[offset:offset + INDEX_STEP]
+            # every byte is a run of 1 to 64 ticks
+            tick += len(chunk) + sum(byte & 0x3F for byte in chunk)
+        self.ticks = tick
+
+    # goes through the direction of every tick starting from the given tick
+    def directions(self, start=0):
+        data = self.data
+        tick = 0
+        first = HEADER.size
+        # start reading from the last indexed byte at or before the start tick
+        if start > 0:
+            if self.index is None:
+                self.build_index()
+            chunk = bisect_right(self.index, start) - 1
+            if chunk >= 0:
+                tick = self.index[chunk]
+                first = HEADER.size + chunk * INDEX_STEP
+        for offset in range(first, len(data)):
+            byte = data[offset]
+            run = (byte & 0x3F) + 1
+            # skip whole runs that are before the start
+            if tick + run <= start:
+                tick += run
+                continue
+            direction = DIRECTIONS[byte >> 6]
+            for _ in range(max(start - tick, 0), run):
+                yield direction
+            tick += run
+
+    # number of ticks in the recording
+    def __len__(self):
+        if self.ticks is None:
+            self.build_index()
+        return self.ticks
+
+    # creates a game in the same state the recorded game started in
+    def game(self, snake_class=engine.Snake, fruit_class=engine.Fruit):
+        return engine.Game(self.grid, self.seed, True, snake_class, fruit_class)
+
+    # plays the recording as fast as possible without a window and returns the game
+    # once it reaches the until tick (or the end of the recording). on_tick is called
+    # with the game and the StepResult of every tick
+    def play(self, until=None, on_tick=None):
+        game = self.game()
+        # ticks played in total, game.ticks starts over every time the snake dies
+        played = 0
+        for direction in self.directions():
+            if until is not None and played >= until:
+                break
+            result = game.step(direction)
+            played += 1
+            if on_tick is not None:
+                on_tick(game, result)
+        return game
+
+    # closes the file
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# plays a recording without a window and prints how it ended
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="plays a snake recording as fast as possible without a window")
+    parser.add_argument("path", help="recording to play")
+    parser.add_argument("--until", type=int, default=None, help="tick to stop at")
+    args = parser.parse_args(argv)
+
+    with Replay(args.path) as replay:
+        # counts every tick and death while playing
+        stats = {"ticks": 0, "deaths": 0}
+
+        def on_tick(game, result):
+            stats["ticks"] += 1
+            if result.cause is not None:
+                stats["deaths"] += 1
+
+        start = time.perf_counter()
+        game = replay.play(args.until, on_tick)
+        elapsed = time.perf_counter() - start
+
+    print(f"seed {replay.seed}, {stats['ticks']} ticks, {stats['deaths']} deaths in {elapsed:.2f}s "
+          f"({stats['ticks'] / elapsed if elapsed > 0 else 0:.0f} ticks/sec)")
+    print(f"snake length {len(game.snake)} at {game.snake.head()}, fruit at {game.fruit.fruit_pos}")
+    return 0
+
+# runs if we're running the script itself
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import sys
+import time
+
+import engine
+from engine import DIRECTIONS
+
+# this module hosts games on a server. the server plays every session's game itself
+# at a fixed tick rate, clients only send the directions they want to turn and draw
+# what the server tells them. instead of the whole snake every tick the server sends
+# what changed: the new head, whether the tail was popped and where the fruit moved,
+# which is 5 bytes on most ticks. clients keep their own copy of the snake up to date
+# from those changes with a Mirror. every session is ticked by one loop so hundreds
+# of sessions cost one timer instead of hundreds
+
+# the server starts every connection with "SNKS", the protocol version, the grid
+# width and height, the number of ticks per second and the fruit tile
+HELLO = struct.Struct("<4sBHHHI")
+MAGIC = b"SNKS"
+VERSION = 1
+# every tick is a byte of flags and the head tile (y * width + x), followed by the
+# fruit tile if the fruit moved
+TICK = struct.Struct("<BI")
+FRUIT = struct.Struct("<I")
+# fruit tile sent when there is no fruit (the snake filled the board)
+NO_FRUIT = 0xFFFFFFFF
+
+# the tail was popped this tick (it stays when the snake ate)
+POPPED = 1
+# the fruit moved this tick and its tile follows
+FRUIT_MOVED = 2
+# the snake died (or won) and started over, the head is the new snake's only part
+RESET = 4
+
+# clients send a byte with the Direction's value for every turn
+# a client that hasn't read this many bytes of ticks is too slow to keep up and is dropped
+MAX_BUFFERED = 1 << 16
+
+# stands in for the fruit while a Mirror moves its snake, the snake grows (keeps its
+# tail) when the fruit is on the new head
+class Growth():
+    __slots__ = ("fruit_pos",)
+
+    def __init__(self):
+        self.fruit_pos = None
+
+    # the server says where the real fruit goes
+    def spawn(self, grid):
+        pass
+
+# a client's copy of a session's game kept up to date from the bytes the server sends
+class Mirror():
+    # snake_class and fruit_class can be the pygame versions so the game can be drawn
+    def __init__(self, snake_class=engine.Snake, fruit_class=engine.Fruit):
+        self.snake_class = snake_class
+        self.fruit_class = fruit_class
+        # bytes received that don't make up a whole message yet
+        self.buffer = bytearray()
+        # set once the server's hello arrives
+        self.grid = None
+        self.hz = None
+        self.snake = None
+        self.fruit = None
+        self.growth = Growth()
+        # number of ticks played and fruit eaten since the snake last started over
+        self.ticks = 0
+        self.score = 0
+
+    # x and y of a tile number
+    def position(self, tile):
+        return (tile % self.grid[0], tile // self.grid[0])
+
+    # adds bytes from the server and plays every whole tick in them
+    # returns the number of ticks played
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        offset = 0
+
+        if self.grid is None:
+            if len(buffer) < HELLO.size:
+                return 0
+            magic, version, width, height, hz, fruit_tile = HELLO.unpack_from(buffer, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"not a snake server or protocol version {version} isn't {VERSION}")
+            self.grid = (width, height)
+            self.hz = hz
+            self.snake = self.snake_class(self.grid)
+            self.fruit = self.fruit_class(self.grid)
+            self.fruit.fruit_pos = None if fruit_tile == NO_FRUIT else self.position(fruit_tile)
+            offset = HELLO.size
+
+        ticks = 0
+        while len(buffer) - offset >= TICK.size:
+            flags, head = TICK.unpack_from(buffer, offset)
+            size = TICK.size + (FRUIT.size if flags & FRUIT_MOVED else 0)
+            # the rest of this tick hasn't arrived yet
+            if len(buffer) - offset < size:
+                break
+            fruit_tile = FRUIT.unpack_from(buffer, offset + TICK.size)[0] if flags & FRUIT_MOVED else None
+            offset += size
+            self.apply(flags, head, fruit_tile)
+            ticks += 1
+
+        del buffer[:offset]
+        return ticks
+
+    # plays one tick the server sent
+    def apply(self, flags, head, fruit_tile):
+        snake = self.snake
+        self.ticks += 1
+        if flags & RESET:
+            snake.reset(self.grid)
+            self.ticks = 0
+            self.score = 0
+        else:
+            pos = self.position(head)
+            # the snake only grows when the server kept the tail
+            self.growth.fruit_pos = None if flags & POPPED else pos
+            snake.advance(pos, self.growth, self.grid)
+            if not flags & POPPED:
+                self.score += 1
+        if flags & FRUIT_MOVED:
+            self.fruit.fruit_pos = None if fruit_tile == NO_FRUIT else self.position(fruit_tile)
+
+# one client's game on the server
+class Session():
+    __slots__ = ("game", "writer")
+
+    def __init__(self, game, writer):
+        self.game = game
+        self.writer = writer
+
+# plays the game of every connected client and sends each its changes every tick
+class GameServer():
+    # grid and hz are every session's board size and ticks per second, seed decides
+    # the seed of every session's game (random if None) and max_sessions is how many
+    # clients can play at once
+    def __init__(self, host="127.0.0.1", port=8765, grid=(36, 24), hz=12, seed=None, max_sessions=1000):
+        self.host = host
+        self.port = port
+        self.grid = grid
+        self.hz = hz
+        self.max_sessions = max_sessions
+        self.rng = random.Random(seed)
+        self.sessions = set()
+        # the task handling every connection so close can wait for them
+        self.handlers = set()
+        self.server = None
+        # number of ticks played, ticks dropped because the server fell behind and
+        # the time in nanoseconds the last tick of every session took
+        self.ticks = 0
+        self.dropped = 0
+        self.tick_ns = 0
+
+    # the tile number of a position, or NO_FRUIT for no fruit
+    def tile(self, pos):
+        return NO_FRUIT if pos is None else pos[1] * self.grid[0] + pos[0]
+
+    # starts accepting clients, port 0 picks any free port (see self.port after)
+    async def start(self):
+        # hundreds of clients can connect at once when a server starts
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, backlog=max(self.max_sessions, 100))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    # plays ticks until cancelled, after start
+    async def serve(self):
+        timestep = engine.FixedTimestep(self.hz)
+        while True:
+            for _ in range(timestep.ticks()):
+                self.tick()
+            self.dropped = timestep.dropped
+            # sleep until the next tick is due
+            await asyncio.sleep((timestep.tick_ns - timestep.accumulator) / 1e9)
+
+    # stops accepting clients and disconnects every session
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # closing a session's connection ends its handler
+        for session in list(self.sessions):
+            self.drop(session)
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    # plays one tick of every session's game and sends what changed
+    def tick(self):
+        started = time.perf_counter_ns()
+        width = self.grid[0]
+        for session in list(self.sessions):
+            game = session.game
+            fruit_before = game.fruit.fruit_pos
+            result = game.step()
+
+            flags = 0
+            if result.cause is not None:
+                flags |= RESET
+            elif not result.ate:
+                flags |= POPPED
+            fruit_pos = game.fruit.fruit_pos
+            if fruit_pos != fruit_before:
+                flags |= FRUIT_MOVED
+            snake = game.snake
+            message = TICK.pack(flags, snake.head_y * width + snake.head_x)
+            if flags & FRUIT_MOVED:
+                message += FRUIT.pack(self.tile(fruit_pos))
+
+            writer = session.writer
+            # the client stopped reading so it can't keep up
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                self.drop(session)
+                continue
+            writer.write(message)
+        self.ticks += 1
+        self.tick_ns = time.perf_counter_ns() - started
+
+    # disconnects a session
+    def drop(self, session):
+        self.sessions.discard(session)
+        session.writer.close()
+
+    # plays a client's session for as long as it is connected
+    async def handle(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            writer.close()
+            return
+        # ticks are tiny so they are sent as soon as they are written
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        game = engine.Game(self.grid, self.rng.randrange(2 ** 63))
+        session = Session(game, writer)
+        writer.write(HELLO.pack(MAGIC, VERSION, self.grid[0], self.grid[1], self.hz, self.tile(game.fruit.fruit_pos)))
+        self.sessions.add(session)
+        handler = asyncio.current_task()
+        self.handlers.add(handler)
+        try:
+            while True:
+                data = await reader.read(64)
+                # the client disconnected
+                if not data:
+                    break
+                for byte in data:
+                    # anything that isn't a direction is ignored
+                    if byte < len(DIRECTIONS):
+                        game.snake.queue_turn(DIRECTIONS[byte])
+        except ConnectionError:
+            pass
+        finally:
+            self.drop(session)
+            self.handlers.discard(handler)
+
+# connects many clients that turn randomly to a server for the given number of seconds
+# and returns how many ticks they got in total. with no port a server is started in
+# this process so the whole thing can be tried on one machine
+async def load_test(clients, seconds, host="127.0.0.1", port=None, grid=(36, 24), hz=12):
+    server = None
+    serve = None
+    if port is None:
+        server = GameServer(host, 0, grid, hz, seed=0, max_sessions=clients)
+        await server.start()
+        serve = asyncio.create_task(server.serve())
+        port = server.port
+
+    mirrors = []
+    received = [0]
+    rng = random.Random(0)
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        mirror = Mirror()
+        mirrors.append(mirror)
+        ends = time.perf_counter() + seconds
+        try:
+            while time.perf_counter() < ends:
+                data = await asyncio.wait_for(reader.read(4096), timeout=max(ends - time.perf_counter(), 0.01))
+                if not data:
+                    break
+                ticks = mirror.feed(data)
+                received[0] += ticks
+                if ticks and rng.random() < 0.1:
+                    writer.write(bytes((rng.randrange(len(DIRECTIONS)),)))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    stats = {"clients": len(mirrors), "connected": sum(mirror.snake is not None for mirror in mirrors),
+             "ticks_received": received[0]}
+    if server is not None:
+        serve.cancel()
+        stats["server_ticks"] = server.ticks
+        stats["dropped_ticks"] = server.dropped
+        stats["last_tick_ms"] = server.tick_ns / 1e6
+        await server.close()
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="hosts snake games that clients play over TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--width", type=int, default=36, help="number of tiles in the x axis")
+    parser.add_argument("--height", type=int, default=24, help="number of tiles in the y axis")
+    parser.add_argument("--hz", type=int, default=12, help="number of ticks per second")
+    parser.add_argument("--seed", type=int, default=None, help="seed for every session's seed (random by default)")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="most clients that can play at once")
+    parser.add_argument("--load-test", type=int, default=None, metavar="CLIENTS",
+                        help="connect this many clients to a server started here instead of serving")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long the load test runs")
+    args = parser.parse_args(argv)
+    grid = (args.width, args.height)
+
+    if args.load_test is not None:
+        stats = asyncio.run(load_test(args.load_test, args.seconds, args.host, None, grid, args.hz))
+        print(f"load test {stats}")
+        return 0
+
+    async def serve():
+        server = GameServer(args.host, args.port, grid, args.hz, args.seed, args.max_sessions)
+        await server.start()
+        print(f"serving snake on {args.host}:{server.port}")
+        await server.serve()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+# runs if we're running the script itself
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,345 +1,394 @@
 import pygame
 import sys
-from enum import Enum
-from collections import deque
 import random
-from itertools import islice
+import argparse
+import socket
 import time
+from collections import OrderedDict, deque
+from itertools import islice
+
+# the game rules live in engine so they can run without a window, the classes here
+# add the drawing and keyboard parts that need pygame on top of them
+import engine
+from engine import Direction
+from profiler import make_profiler
+from replay import MAX_SEED, Recorder, Replay
+from autopilot import Autopilot
+from server import Mirror
+
+# width and height of a tile in pixels
+TILE = 20
+# width and height of the window in pixels
+WINDOW = (720, 480)
+# width and height in tiles of the chunks the background of a big board is drawn in
+CHUNK = 16
+
+# most milliseconds a paused game sleeps waiting for an event before it wakes up to
+# print the profiler's summary, a paused game does nothing else until an event comes
+PAUSE_WAIT_MS = 500
 
-# enum used to help in steering the snake
-class Direction(Enum):
-    UP = 0
-    DOWN = 1
-    LEFT = 2
-    RIGHT = 3
+# the direction each arrow key turns the snake
+ARROWS = {
+    pygame.K_UP: Direction.UP,
+    pygame.K_DOWN: Direction.DOWN,
+    pygame.K_LEFT: Direction.LEFT,
+    pygame.K_RIGHT: Direction.RIGHT,
+}
+
+class Snake(engine.Snake):
+    __slots__ = ("color", "body_part_dims", "dirty", "redraw")
 
-class Snake():
     # initializes variables for snake
-    def __init__(self, bounds):
+    def __init__(self, grid):
         self.color = (0, 0, 255) # snake color
-        self.body_part_dims = (20, 20) # snake width(x) and height(y)
-        self.reset(bounds) # resets snake to its default
-        # move 20 pixels (1 tile) per frame for 12 frames (240 pixels per second)
-        self.velocity = 20
-
-    # resets snake to a default position, size, and direction
-    def reset(self, bounds):
-        # x and y variables for precise location of snake head
-        self.head_x = bounds[0] - 300
-        self.head_y = bounds[1] - 200
-        # default position of snake within bounds of game window
-        default_pos = (self.head_x, self.head_y)
-        # creates a rectangle object for the head of the snake
-        snake_head = pygame.Rect(default_pos, self.body_part_dims)
-        # insert snake head to the snake queue
-        self.snake_body = deque([snake_head])
-        # sets default direction to the right
-        self.current_dir = Direction.RIGHT
-        self.user_dirs = deque([])
+        self.body_part_dims = (TILE, TILE) # snake width(x) and height(y)
+        super().__init__(grid)
+
+    # resets snake to its default and asks for the whole window to be redrawn
+    def reset(self, grid):
+        super().reset(grid)
+        # tiles that changed since they were last drawn (new heads and popped tails)
+        self.dirty = []
+        # true when the whole window needs to be drawn again
+        self.redraw = True
+
+    # moves the head to a new tile and remembers which tiles changed for drawing
+    def advance(self, new_part_pos, fruit, grid):
+        # the tail is popped by the move unless the snake eats
+        tail = self.tail()
+        ate = super().advance(new_part_pos, fruit, grid)
+
+        self.dirty.append(new_part_pos)
+        if not ate:
+            self.dirty.append(tail)
+        return ate
+
+    # takes back a move and remembers which tiles changed for drawing
+    def undo(self, pushed, popped, where=None):
+        if pushed:
+            self.dirty.append(self.head())
+        super().undo(pushed, popped, where)
+        if popped is not None:
+            self.dirty.append(self.tail())
+
+    # takes back a reset and asks for the whole window to be redrawn
+    def undo_reset(self, saved):
+        super().undo_reset(saved)
+        self.redraw = True
+
+    # a snake in the same state with its own list of changed tiles
+    def copy(self):
+        snake = super().copy()
+        snake.dirty = list(self.dirty)
+        return snake
     
     # displays snake to the game window
-    def draw(self, game_window):
-        # loop through each rectangle object in the snake body
-        for body_part in self.snake_body:
-            # draws body part to the window
-            pygame.draw.rect(game_window, self.color, body_part)
-    
-    # changes movement direction of snake
-    def steer(self, keys):
-        # the steering logic would act strange if multiple movement keys are pressed
-        # at once so I disabled steering unless one movement key is pressed at a time
-        # note: to avoid all of these nested if statements and improve the logic I think 
-        # it would be better to have conditions for when the user_dirs queue is empty or not
-        # i.e. one big if statement for when the queue is empty and the else for when its not
-
-        # user input is inserted in a queue since input is frame dependant. since movement is 
-        # time dependant and each frame doesn't move the snake to a new position, I found that the 
-        # user input had to be put in a queue to be processed so that the movement can catch up 
-        # and go through those inputs correctly without bugging out the snake (the biggest problem
-        # I had was that the snake would just go into itself since the user can input multiple 
-        # frames of input before the snake actually moves to a new position)
-        
-        # change snake direction to the left only if the left 
-        # key is pressed and snake isn't moving to the right
-        if (keys[pygame.K_LEFT] and self.current_dir != Direction.RIGHT and 
-        not keys[pygame.K_UP] and not keys[pygame.K_DOWN] and not keys[pygame.K_RIGHT]):
-            
-            # user input queue is empty
-            if (len(self.user_dirs) == 0):
-                self.user_dirs.appendleft(Direction.LEFT)
-
-            # we can't insert a direction to the queue if the last item added is the
-            # same direction (redundant) or opposite (snake can't go into itself)
-            # user input queue is not empty and last item added doesn't equal left or right
-            elif len(self.user_dirs) != 0 and self.user_dirs[0] != Direction.LEFT and self.user_dirs[0] != Direction.RIGHT:
-                self.user_dirs.appendleft(Direction.LEFT)
-        
-        # change snake direction to the right only if the right 
-        # key is pressed and snake isn't moving to the left
-        elif (keys[pygame.K_RIGHT] and self.current_dir != Direction.LEFT and 
-        not keys[pygame.K_UP] and not keys[pygame.K_DOWN] and not keys[pygame.K_LEFT]):
-            
-            # user input queue is empty
-            if (len(self.user_dirs) == 0):
-                self.user_dirs.appendleft(Direction.RIGHT)
-            # user input queue is not empty and last item added doesn't equal right or left
-            elif len(self.user_dirs) != 0 and self.user_dirs[0] != Direction.RIGHT and self.user_dirs[0] != Direction.LEFT:
-                self.user_dirs.appendleft(Direction.RIGHT)
-        
-        # change snake direction to up only if the up 
-        # key is pressed and snake isn't moving down
-        elif (keys[pygame.K_UP] and self.current_dir != Direction.DOWN and 
-        not keys[pygame.K_LEFT] and not keys[pygame.K_RIGHT] and not keys[pygame.K_DOWN]):
-            
-            # user input queue is empty
-            if (len(self.user_dirs) == 0):
-                self.user_dirs.appendleft(Direction.UP)
-            # user input queue is not empty and last item added doesn't equal up or down
-            elif len(self.user_dirs) != 0 and self.user_dirs[0] != Direction.UP and self.user_dirs[0] != Direction.DOWN:
-                self.user_dirs.appendleft(Direction.UP)
-        
-        # change snake direction to down only if the down 
-        # key is pressed and snake isn't moving up
-        elif (keys[pygame.K_DOWN] and self.current_dir != Direction.UP and 
-        not keys[pygame.K_LEFT] and not keys[pygame.K_RIGHT] and not keys[pygame.K_UP]):
-            
-            # user input queue is empty
-            if (len(self.user_dirs) == 0):
-                self.user_dirs.appendleft(Direction.DOWN)
-            # user input queue is not empty and last item added doesn't equal down or up
-            elif len(self.user_dirs) != 0 and self.user_dirs[0] != Direction.DOWN and self.user_dirs[0] != Direction.UP:
-                self.user_dirs.appendleft(Direction.DOWN)
-
-    # comments apply for the turn and move functions
-    # instead of shifting every part of the snake by 1 position we can just 
-    # add a new segment at the front with the next position and delete the
-    # last segment of the snake to mimic the snake moving
-
-    # instead of moving the snake based on frames, we move it based on time
-    # so that no matter what fps the user runs the game on, the snake will 
-    # always move at the same speed. we calculate movement with delta time
-    # which is the time between two frames. the delta time of a game running 
-    # 30 fps is 2x greater than the delta time of a game running 60 fps since
-    # there is more time between the frames. however, since 30 fps is half the 
-    # frames of 60, they end up having the same movement.
-    
-    # turns the snake within the game window
-    def turn(self, fruit, bounds, delta_time, calibrated_fps):
-        # get the head of the snake from the queue
-        snake_head = self.snake_body[0]
-        # get the first direction in queue
-        user_dir = self.user_dirs[-1]
-        
-        # create a tuple to store the new body part's position
-        new_part_pos = ()
-
-        # first input direction is up
-        if user_dir == Direction.UP:
-            # update the precise y axis position of the snake
-            self.head_y = self.head_y - self.velocity * delta_time * calibrated_fps
-            # round y to the nearest tile in the y axis
-            rounded_y = round(self.head_y / self.body_part_dims[1]) * self.body_part_dims[1]
-            
-            # set the new part's position with the rounded y position
-            new_part_pos = (snake_head.x, rounded_y)
-            
-        # first input direction is down
-        elif user_dir == Direction.DOWN:
-            # update the precise y axis position of the snake
-            self.head_y = self.head_y + self.velocity * delta_time * calibrated_fps
-            # round y to the nearest tile in the y axis
-            rounded_y = round(self.head_y / self.body_part_dims[1]) * self.body_part_dims[1]
-            
-            # set the new part's position with the rounded y position
-            new_part_pos = (snake_head.x, rounded_y)
-            
-        # first input direction is left
-        elif user_dir == Direction.LEFT:
-            # update the precise x axis position of the snake
-            self.head_x = self.head_x - self.velocity * delta_time * calibrated_fps
-            # round x to the nearest tile in the x axis
-            rounded_x = round(self.head_x / self.body_part_dims[0]) * self.body_part_dims[0]
-            
-            # set the new part's position with the rounded x position
-            new_part_pos = (rounded_x, snake_head.y)
-            
-        # first input direction is right
-        elif user_dir == Direction.RIGHT:
-            # update the precise x axis position of the snake
-            self.head_x = self.head_x + self.velocity * delta_time * calibrated_fps
-            # round x to the nearest tile in the x axis
-            rounded_x = round(self.head_x / self.body_part_dims[0]) * self.body_part_dims[0]
-            
-            # set the new part's position with the rounded x position
-            new_part_pos = (rounded_x, snake_head.y)
-        
-        print(self.current_dir)
-        # check to see if the new part's position is different from the snake head's position
-        if new_part_pos != snake_head.topleft:
-            print(self.user_dirs)
-            # set the current direction to the first direction in queue and remove from queue
-            self.current_dir = self.user_dirs.pop()
-            # append new body part to the front of the body queue
-            # the new body part is the new head of the snake
-            self.snake_body.appendleft(pygame.Rect(new_part_pos, self.body_part_dims))
-            
-            # after moving check if the head of snake is not touching food
-            if not self.collides_with_food(fruit):
-                # since there is no food, we pop the last segment of the snake
-                self.snake_body.pop()
-            else:
-                # note we don't pop here since the snake should grow by 1 part from eating
-                # eat fruit and spawn new fruit
-                fruit.spawn(bounds)
-    
-    
-    # moves the snake within the game window
-    def move(self, fruit, bounds, delta_time, calibrated_fps):
-        # get the head of the snake from the queue
-        snake_head = self.snake_body[0]
-        
-        # create a tuple to store the new body part's position
-        new_part_pos = ()
-
-        # current direction is up
-        if self.current_dir == Direction.UP:
-            # update the precise y axis position of the snake
-            self.head_y = self.head_y - self.velocity * delta_time * calibrated_fps
-            # round y to the nearest tile in the y axis
-            rounded_y = round(self.head_y / self.body_part_dims[1]) * self.body_part_dims[1]
-            
-            # set the new part's position with the rounded y position
-            new_part_pos = (snake_head.x, rounded_y)
-            
-        # current direction is down
-        elif self.current_dir == Direction.DOWN:
-            # update the precise y axis position of the snake
-            self.head_y = self.head_y + self.velocity * delta_time * calibrated_fps
-            # round y to the nearest tile in the y axis
-            rounded_y = round(self.head_y / self.body_part_dims[1]) * self.body_part_dims[1]
-            
-            # set the new part's position with the rounded y position
-            new_part_pos = (snake_head.x, rounded_y)
-            
-        # current direction is left
-        elif self.current_dir == Direction.LEFT:
-            # update the precise x axis position of the snake
-            self.head_x = self.head_x - self.velocity * delta_time * calibrated_fps
-            # round x to the nearest tile in the x axis
-            rounded_x = round(self.head_x / self.body_part_dims[0]) * self.body_part_dims[0]
-            
-            # set the new part's position with the rounded x position
-            new_part_pos = (rounded_x, snake_head.y)
-            
-        # current direction is right
-        elif self.current_dir == Direction.RIGHT:
-            # update the precise x axis position of the snake
-            self.head_x = self.head_x + self.velocity * delta_time * calibrated_fps
-            # round x to the nearest tile in the x axis
-            rounded_x = round(self.head_x / self.body_part_dims[0]) * self.body_part_dims[0]
-            
-            # set the new part's position with the rounded x position
-            new_part_pos = (rounded_x, snake_head.y)
-        
-        print(self.current_dir)
-        # check to see if the new part's position is different from the snake head's position
-        if new_part_pos != snake_head.topleft:
-            
-            # append new body part to the front of the body queue
-            # the new body part is the new head of the snake
-            self.snake_body.appendleft(pygame.Rect(new_part_pos, self.body_part_dims))
-            
-            # after moving check if the head of snake is not touching food
-            if not self.collides_with_food(fruit):
-                # since there is no food, we pop the last segment of the snake
-                self.snake_body.pop()
-            else:
-                # note we don't pop here since the snake should grow by 1 part from eating
-                # eat fruit and spawn new fruit
-                fruit.spawn(bounds)
-    
-    # checks if snake is touching food
-    def collides_with_food(self, fruit):
-        # get the head of the snake from the queue
-        snake_head = self.snake_body[0]
+    # alpha is how far (from 0 to 1) the game is between the last tick and the next
+    # one, the head is drawn that far along from the tile it was on before its last
+    # move so it slides smoothly instead of jumping a whole tile every tick
+    def draw(self, game_window, alpha=1.0):
+        # get the width and height of a body part
+        width, height = self.body_part_dims
+        # loop through each tile in the snake body except the head, the rectangles
+        # are only made here when drawing instead of being stored in the body
+        for body_part in islice(self.body(), 1, None):
+            # draws body part to the window as a rectangle at its pixel position
+            pygame.draw.rect(game_window, self.color, (body_part[0] * width, body_part[1] * height, width, height))
 
-        # check if the snake head is touching food
-        if snake_head.topleft == fruit.fruit_rec.topleft:
-            return True
+        # draws the head between the tile it came from and the tile it is on
+        self.draw_head(game_window, alpha)
 
-        # snake isn't touching food
-        return False
-    
-    # check if the snake is out of bounds
-    def out_of_bounds(self, bounds):
-        # get the head of the snake from the queue
-        snake_head = self.snake_body[0]
-        
-        # check if snake is out of bounds in the x direction
-        if snake_head.left < 0 or snake_head.left >= bounds[0]:
-            return True
-        
-        # check if snake is out of bounds in the y direction
-        if snake_head.top < 0 or snake_head.top >= bounds[1]:
-            return True
-        
-        # snake isn't out of bounds
-        return False
+    # displays the snake head that far along from the tile it was on before its last move
+    def draw_head(self, game_window, alpha):
+        # get the width and height of a body part
+        width, height = self.body_part_dims
+        # pixel position that far along between the two tiles
+        prev_x, prev_y = self.prev_head
+        head_x, head_y = self.head()
+        slide_x = (prev_x + (head_x - prev_x) * alpha) * width
+        slide_y = (prev_y + (head_y - prev_y) * alpha) * height
+        pygame.draw.rect(game_window, self.color, (round(slide_x), round(slide_y), width, height))
 
-    # check if snake collides with itself
-    def collides_with_tail(self):
-        # snake can't collide with itself if it is only a head
-        if len(self.snake_body) == 1:
+# keeps track of whether the game window has the keyboard and can be seen
+class WindowState():
+    def __init__(self):
+        self.focused = True
+        self.visible = True
+
+    # updates the state from a window event, returns true if the event changed it
+    def handle(self, event):
+        if event.type == pygame.WINDOWFOCUSLOST:
+            self.focused = False
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.focused = True
+        elif event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+            self.visible = False
+        elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN, pygame.WINDOWMAXIMIZED):
+            self.visible = True
+        else:
             return False
-        
-        # get the head of the snake from the queue
-        snake_head = self.snake_body[0]
+        return True
 
-        # deque doesn't support bracket slicing and indexing is inefficient so this is a workaround
-        # sets body to the snake body queue excluding the head
-        body = deque(islice(self.snake_body, 1, len(self.snake_body)))
+    # true when the player can see and steer the game
+    @property
+    def active(self):
+        return self.focused and self.visible
 
-        x = 1
-        print(f'{x} {snake_head.topleft}')
-        
-        # loop through entire body
-        for body_part in body:
-            x += 1
-            print(f'{x} {body_part.topleft}')
-            # check if head and body part are colliding
-            if body_part.topleft == snake_head.topleft:
-                return True
-        
-        # head isn't colliding with body
-        return False
+# turns the snake from arrow key presses. every KEYDOWN event is handled, so a press
+# shorter than a frame or two quick turns between frames each count, and the turns
+# go through Snake.queue_turn so only turns that change something are kept and only
+# a few of them at a time. the time every queued press was handled is kept so the
+# profiler can report how long it took until a tick turned the snake ("input_latency").
+# pygame doesn't say when a key was pressed, so the time the press waited in the event
+# queue before the frame handled it (up to a frame) isn't part of that latency
+class KeyboardInput():
+    # snake is the snake to turn and profiler records the latencies
+    def __init__(self, snake, profiler):
+        self.snake = snake
+        self.profiler = profiler
+        # when each turn in the snake's user input queue was pressed, in the same order
+        self.pressed = deque()
+
+    # queues the turn of an arrow key press
+    def handle(self, event):
+        if event.type != pygame.KEYDOWN or event.key not in ARROWS:
+            return
+        stamp = time.perf_counter_ns()
+        if self.snake.queue_turn(ARROWS[event.key]):
+            self.pressed.appendleft(stamp)
+            self.profiler.count("turns_queued")
+        else:
+            self.profiler.count("turns_ignored")
+
+    # records the latency of every press the last tick played, called after every tick
+    def played(self):
+        pressed = self.pressed
+        while len(pressed) > len(self.snake.user_dirs):
+            self.profiler.stop("input_latency", pressed.pop())
+
+    # forgets every press, i.e. after the snake started over and lost its queue
+    def clear(self):
+        self.pressed.clear()
+
+class Fruit(engine.Fruit):
+    __slots__ = ("color", "fruit_dims")
 
-class Fruit():
     # initialize variables for fruit
-    def __init__(self, bounds):
+    def __init__(self, grid, rng=None, free_cells=None):
         self.color = (0, 255, 0) # fruit color
-        self.fruit_dims = (20, 20) # fruit width and height
-        self.spawn(bounds) # spawns a new fruit
+        self.fruit_dims = (TILE, TILE) # fruit width and height
+        super().__init__(grid, rng, free_cells)
 
-    # creates a fruit at a random location
-    def spawn(self, bounds):
-        # tuple that calculates random position of fruit
-        # note that we use 20 since each position is 20 pixels
-        fruit_pos = (random.randint(0, (bounds[0] // 20)-1) * 20, random.randint(0, (bounds[1] // 20)-1) * 20)
-        # creates a fruit rectangle at a random position
-        self.fruit_rec = pygame.Rect(fruit_pos, self.fruit_dims)
+    # rectangle object of the fruit at its pixel position
+    @property
+    def fruit_rec(self):
+        return pygame.Rect((self.fruit_pos[0] * TILE, self.fruit_pos[1] * TILE), self.fruit_dims)
 
     # displays the fruit to the game window
     def draw(self, game_window):
+        # there is no fruit once the snake fills the board
+        if self.fruit_pos is None:
+            return
         # draws the fruit with the given color and rectangle object
         pygame.draw.rect(game_window, self.color, self.fruit_rec)
 
-def main_game_loop():
+# draws the game to the window. by default everything is drawn every frame, but in
+# incremental mode only the tiles that changed since the last frame (the new head,
+# the popped tail and the fruit) are drawn and sent to the display, so a frame costs
+# the same no matter how long the snake is or how big the window is
+class Renderer():
+    # initializes variables for the renderer
+    def __init__(self, incremental=False):
+        self.incremental = incremental
+        self.background = (0, 0, 0) # window color
+        self.invalidate()
+
+    # makes the next frame draw the whole window, i.e. after the window was resized or uncovered
+    def invalidate(self):
+        self.full = True
+
+    # draws one frame of the game
+    def draw(self, game_window, snake, fruit, alpha):
+        # draws the whole window when incremental mode is off or nothing can be trusted
+        if not self.incremental or self.full or snake.redraw:
+            # reset the game window to black
+            # we do this so that whatever was drawn last frame doesn't stay
+            # on the game window when we draw for the current frame
+            game_window.fill(self.background)
+            # draw the fruit and snake
+            fruit.draw(game_window)
+            snake.draw(game_window, alpha)
+
+            # display everything that was done to the game window
+            # note that any visual manipulation that was done won't
+            # be displayed until it reaches this line of code
+            pygame.display.update()
+        else:
+            # tiles that changed this frame, the head slides between the tile it came
+            # from and the tile it is on so both are redrawn every frame along with
+            # the tiles it slid between last frame
+            tiles = set(snake.dirty)
+            tiles.update(self.slide_tiles)
+            self.slide_tiles = (snake.prev_head, snake.head())
+            tiles.update(self.slide_tiles)
+            # the fruit moved
+            if fruit.fruit_pos != self.fruit_pos:
+                tiles.add(self.fruit_pos)
+                tiles.add(fruit.fruit_pos)
+                # there is no tile to draw when there was or is no fruit
+                tiles.discard(None)
+
+            # draws every changed tile the way a full redraw would have left it
+            width, height = snake.body_part_dims
+            head = snake.head()
+            rects = []
+            for tile in tiles:
+                rect = pygame.Rect(tile[0] * width, tile[1] * height, width, height)
+                # the head is drawn by the slide below
+                if not snake.is_free(tile) and tile != head:
+                    color = snake.color
+                elif tile == fruit.fruit_pos:
+                    color = fruit.color
+                else:
+                    color = self.background
+                game_window.fill(color, rect)
+                rects.append(rect)
+
+            # draws the head between the tile it came from and the tile it is on
+            snake.draw_head(game_window, alpha)
+
+            # display only the tiles that changed
+            pygame.display.update(rects)
+
+        # everything that changed has now been drawn
+        snake.dirty.clear()
+        snake.redraw = False
+        self.full = False
+        self.fruit_pos = fruit.fruit_pos
+        self.slide_tiles = (snake.prev_head, snake.head())
+
+# draws a board bigger than the window through a camera that follows the snake's head.
+# only what is inside the window is drawn: the background is blitted from chunks of
+# CHUNK x CHUNK tiles that are drawn once and kept (the board never changes under the
+# snake), and only the body parts on screen are drawn, so a frame costs the same on a
+# 10000x10000 board as on a small one. the camera moves every frame so the whole
+# window is sent to the display every frame
+class ViewportRenderer():
+    # grid is the number of tiles in the x and y axis of the board and cache_size is
+    # the most chunks kept at once (the least recently drawn are thrown away first)
+    def __init__(self, grid, cache_size=256):
+        self.grid = grid
+        self.cache_size = cache_size
+        # the two colors of the checkered board, so moving around it can be seen
+        self.background = ((0, 0, 0), (16, 16, 16))
+        self.wall = (64, 64, 64) # color of everything outside the board
+        # drawn chunks by their x and y in chunks
+        self.chunks = OrderedDict()
+        self.invalidate()
+
+    # the whole window is drawn every frame so there is nothing to forget, but the
+    # chunks are drawn again in case the display format changed with the window
+    def invalidate(self):
+        self.chunks.clear()
+
+    # gets the surface of a chunk, drawing it if it isn't kept already
+    def chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        surface = self.chunks.get(key)
+        if surface is not None:
+            self.chunks.move_to_end(key)
+            return surface
+
+        surface = pygame.Surface((CHUNK * TILE, CHUNK * TILE)).convert()
+        cols, rows = self.grid
+        for y in range(CHUNK):
+            tile_y = chunk_y * CHUNK + y
+            for x in range(CHUNK):
+                tile_x = chunk_x * CHUNK + x
+                if 0 <= tile_x < cols and 0 <= tile_y < rows:
+                    color = self.background[(tile_x + tile_y) % 2]
+                else:
+                    color = self.wall
+                surface.fill(color, (x * TILE, y * TILE, TILE, TILE))
+
+        self.chunks[key] = surface
+        if len(self.chunks) > self.cache_size:
+            self.chunks.popitem(last=False)
+        return surface
+
+    # draws one frame of the game
+    def draw(self, game_window, snake, fruit, alpha):
+        view_width, view_height = game_window.get_size()
+        # the camera is centered on the head as it slides between tiles, so it is
+        # worked out in pixels of the whole board
+        prev_x, prev_y = snake.prev_head
+        head_x, head_y = snake.head()
+        camera_x = round((prev_x + (head_x - prev_x) * alpha + 0.5) * TILE - view_width / 2)
+        camera_y = round((prev_y + (head_y - prev_y) * alpha + 0.5) * TILE - view_height / 2)
+
+        # background chunks that are at least partly in the window
+        size = CHUNK * TILE
+        for chunk_y in range(camera_y // size, (camera_y + view_height - 1) // size + 1):
+            for chunk_x in range(camera_x // size, (camera_x + view_width - 1) // size + 1):
+                game_window.blit(self.chunk(chunk_x, chunk_y), (chunk_x * size - camera_x, chunk_y * size - camera_y))
+
+        # tiles that are at least partly in the window (right and bottom not included)
+        left, top = camera_x // TILE, camera_y // TILE
+        right, bottom = (camera_x + view_width - 1) // TILE + 1, (camera_y + view_height - 1) // TILE + 1
+
+        fruit_pos = fruit.fruit_pos
+        if fruit_pos is not None and left <= fruit_pos[0] < right and top <= fruit_pos[1] < bottom:
+            game_window.fill(fruit.color, (fruit_pos[0] * TILE - camera_x, fruit_pos[1] * TILE - camera_y, TILE, TILE))
+
+        # the body parts in the window except the head, which is drawn sliding below
+        head = (head_x, head_y)
+        for body_part in snake.parts_in(left, top, right, bottom):
+            if body_part != head:
+                game_window.fill(snake.color, (body_part[0] * TILE - camera_x, body_part[1] * TILE - camera_y, TILE, TILE))
+        # the camera follows the head so it is always in the middle of the window
+        game_window.fill(snake.color, ((view_width - TILE) // 2, (view_height - TILE) // 2, TILE, TILE))
+
+        pygame.display.update()
+
+        # nothing here uses the dirty tiles but they still have to be emptied every frame
+        snake.dirty.clear()
+        snake.redraw = False
+
+# picks the renderer for a board, boards that don't fit in the window are drawn
+# through a camera that follows the snake
+def make_renderer(grid, bounds, incremental=False):
+    if grid[0] * TILE > bounds[0] or grid[1] * TILE > bounds[1]:
+        return ViewportRenderer(grid)
+    return Renderer(incremental)
+
+# logic_hz is the number of times per second the snake moves a tile
+# incremental is true to only draw the parts of the window that changed each frame
+# profiler is a profiler.Profiler to time each part of the frame (off by default)
+# seed decides where fruit spawns (random if None) and record is a file to save the game to
+# autopilot is true to let the game steer the snake by itself instead of the keyboard
+# board is the number of tiles in the x and y axis of the board (the size of the window
+# by default), boards bigger than the window are seen through a camera on the head
+# connect is the (host, port) of a server.py to play on instead of playing here
+def main_game_loop(logic_hz=12, incremental=False, profiler=None, seed=None, record=None, autopilot=False, board=None,
+                   connect=None):
+    # the server plays the game and this only draws it and sends the keys pressed
+    if connect is not None:
+        client_game_loop(connect, incremental)
+
     # window setup
-    size_x = 720 # width of window
-    size_y = 480 # height of window
+    size_x, size_y = WINDOW # width and height of window
 
     # tuple for the dimensions of the game window
     bounds = (size_x, size_y)
+    # tuple for the number of tiles in the x and y axis of the board
+    grid = board if board is not None else (size_x // TILE, size_y // TILE)
+
+    # every game has a seed so that it can be recorded and played back exactly
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    # writes the direction of every tick to the record file, opened before the window
+    # so a seed that can't be recorded fails before anything is shown
+    recorder = Recorder(record, seed, grid, logic_hz) if record is not None else None
 
     # initializes all necessary pygame modules
     pygame.init()
@@ -348,59 +397,95 @@ def main_game_loop():
     game_window = pygame.display.set_mode(bounds)
     pygame.display.set_caption("Snake")
 
-    # creates a snake and fruit object
-    snake = Snake(bounds)
-    fruit = Fruit(bounds)
+    # times each part of the frame if profiling is on (SNAKE_PROFILE=1 or --profile)
+    if profiler is None:
+        profiler = make_profiler()
+
+    # plays the game, which creates the snake and the fruit (that only spawns on tiles
+    # the snake isn't on) and starts the snake over when it dies or fills the board
+    # the game times its collision checks with the same profiler
+    game = engine.Game(grid, seed, snake_class=Snake, fruit_class=Fruit, profiler=profiler)
+    snake = game.snake
+    fruit = game.fruit
+    # steers the snake toward the fruit every tick in place of the keyboard
+    pilot = Autopilot(snake, fruit, grid) if autopilot else None
 
-    # stores the time of when the previous frame was called
-    # for the first iteration it is a less up-to-date time of the current frame
-    prev_time = time.time()
     # frames per second (number of iterations of main loop per second)
     fps = 60
-    # frames of game for frame dependant movement
-    calibrated_fps = 12
+    # created once so that tick can measure the time since the last frame
+    clock = pygame.time.Clock()
+    # decides how many ticks the snake moves each frame so that it always moves
+    # logic_hz tiles per second no matter how long each frame takes
+    timestep = engine.FixedTimestep(logic_hz)
+    # draws the snake and fruit to the game window every frame
+    renderer = make_renderer(grid, bounds, incremental)
+    # turns the snake from arrow key presses
+    keyboard = KeyboardInput(snake, profiler)
+
+    # whether the window has the keyboard and can be seen
+    window = WindowState()
 
     # game states
     run = True
     pause = False
+    # true when the game paused itself because the window lost the keyboard or was
+    # hidden, it carries on by itself once the window is back
+    auto_paused = False
 
     # game continues to run until both states are false
     while run or pause:
         
         # pause state is true
         while pause:
-            # loops through events (i.e. clicks, keystrokes, etc.)
-            for event in pygame.event.get():
-                # check if user exits game window
-                if event.type == pygame.QUIT:
-                    # sets both states to false to terminate game
+            # sleeps until an event comes instead of checking for events as fast as
+            # possible, so a paused game uses next to no CPU (NOEVENT after the timeout)
+            event = pygame.event.wait(PAUSE_WAIT_MS)
+
+            # check if user exits game window
+            if event.type == pygame.QUIT:
+                # sets both states to false to terminate game
+                pause = False
+                run = False
+
+            # check if user presses key
+            if event.type == pygame.KEYDOWN:
+                # check if key pressed is the Esc key
+                if event.key == pygame.K_ESCAPE:
+                    # changes to run state
                     pause = False
-                    run = False
-                
-                # check if user presses key
-                if event.type == pygame.KEYDOWN:
-                    # check if key pressed is the Esc key
-                    if event.key == pygame.K_ESCAPE:
-                        # changes to run state
-                        pause = False
-                        run = True
+                    run = True
+
+            # the window has the keyboard and can be seen again after pausing itself
+            if window.handle(event) and auto_paused and window.active:
+                pause = False
+                run = True
+
+            # the paused frame is drawn again if the window was uncovered
+            if event.type == pygame.WINDOWEXPOSED and window.visible:
+                renderer.invalidate()
+                renderer.draw(game_window, snake, fruit, timestep.alpha())
+
+            if run:
+                auto_paused = False
+                # forget the time spent paused so the snake doesn't catch up on it
+                timestep.reset()
+                # the window may have been covered while paused
+                renderer.invalidate()
+
+            profiler.report()
         
         # run state is true
         while run:
-            # stores the time of when the current frame was called
-            curr_time = time.time()
-            # get the time between frames by subtracting 
-            delta_time = curr_time - prev_time
-            # set pre_time to the current frame's time so that we have 
-            # the previous frame's time for the next frame/iteration
-            prev_time = curr_time
+            # time of the start of the frame and its input
+            frame_started = profiler.start()
 
             # loops through events
             for event in pygame.event.get():
                 # check if user exits game window
                 if event.type == pygame.QUIT:
-                    # sets run state to false to terminate game
+                    # sets both states to false to terminate game
                     run = False
+                    pause = False
                 
                 # check if user presses key
                 if event.type == pygame.KEYDOWN:
@@ -409,49 +494,259 @@ def main_game_loop():
                         # changes to pause state
                         pause = True
                         run = False
-            
-            # contains a collection of all keys pressed and not pressed as booleans
-            keys = pygame.key.get_pressed()
-            
-            # enter valid keystrokes to the user input queue
-            snake.steer(keys)
 
-            # reset the game window to black
-            # we do this so that whatever was drawn last frame doesn't stay
-            # on the game window when we draw for the current frame
-            game_window.fill((0, 0, 0))
-            
-            # check if the user input queue is not empty
-            if len(snake.user_dirs) > 0:
-                # turn the snake
-                snake.turn(fruit, bounds, delta_time, calibrated_fps)
-            # user input queue is empty
-            else:
-                # moves the snake
-                snake.move(fruit, bounds, delta_time, calibrated_fps)
-            
-            # checks if the snake is out of bounds or colliding with itself
-            if snake.out_of_bounds(bounds) or snake.collides_with_tail():
-                # reset snake to its default position and size
-                snake.reset(bounds)
-            
+                # check if the window changed size or was uncovered
+                if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+                    # whatever was drawn before can't be trusted so draw everything again
+                    renderer.invalidate()
+
+                # the window lost the keyboard or was hidden so the player can't play,
+                # the autopilot doesn't need either and carries on in the background
+                if window.handle(event) and not window.active and pilot is None and run:
+                    pause = True
+                    run = False
+                    auto_paused = True
+                    profiler.count("auto_pauses")
+
+                # enter valid keystrokes to the user input queue
+                if pilot is None:
+                    keyboard.handle(event)
+            profiler.stop("input", frame_started)
+
+            # play every tick that is due since the last frame
+            logic_started = profiler.start()
+            for _ in range(timestep.ticks()):
+                profiler.count("ticks")
+                # the autopilot puts its direction for this tick in the user input queue
+                if pilot is not None:
+                    pilot_started = profiler.start()
+                    pilot.drive()
+                    profiler.stop("autopilot", pilot_started)
+                # the direction the snake moves this tick, the turn pressed longest ago
+                # if there is one
+                if len(snake.user_dirs) > 0:
+                    direction = snake.user_dirs[-1]
+                    profiler.count("turns")
+                else:
+                    direction = snake.current_dir
+                    profiler.count("moves")
+                # moves the snake, and resets it if it died or filled the board
+                result = game.step()
+                # save the direction the snake moved this tick
+                if recorder is not None:
+                    recorder.record(direction)
+                # a new fruit spawned after the snake ate
+                if result.ate:
+                    profiler.count("spawns")
+                # keys pressed for the snake that died are thrown away
+                if result.cause is not None:
+                    keyboard.clear()
+                    profiler.count("wins" if result.cause == "win" else "deaths")
+                else:
+                    # the turn pressed longest ago was played if there was one
+                    keyboard.played()
+            profiler.stop("logic", logic_started)
+
+            # a hidden window isn't drawn and only wakes up once a tick
+            if not window.visible:
+                profiler.count("hidden_frames")
+                # nothing draws the changed tiles so they are forgotten instead of
+                # piling up, and the whole window is drawn once it can be seen again
+                snake.dirty.clear()
+                renderer.invalidate()
+                clock.tick(logic_hz)
+                profiler.stop("frame", frame_started)
+                profiler.report()
+                continue
+
             # draw the fruit and snake
-            fruit.draw(game_window)
-            snake.draw(game_window)
-            
-            # display everything that was done to the game window
-            # note that any visual manipulation that was done won't
-            # be displayed until it reaches this line of code
-            pygame.display.update()
+            render_started = profiler.start()
+            renderer.draw(game_window, snake, fruit, timestep.alpha())
+            profiler.stop("render", render_started)
+
+            # waits so that the loop runs at most fps frames per second
+            clock.tick(fps)
 
-            # sets the frames per second
-            pygame.time.Clock().tick(fps)
+            # time of the whole frame including the wait and prints a summary every few seconds
+            profiler.stop("frame", frame_started)
+            profiler.report()
+
+    # writes everything the profiler recorded if it was given a JSON file
+    profiler.dump()
+    # finishes writing the recording
+    if recorder is not None:
+        recorder.close()
+    # prints how long the autopilot took to decide
+    if pilot is not None:
+        print(f"autopilot {pilot.stats()}")
 
     # terminates pygame and python
     pygame.quit()
     sys.exit()
 
+# plays on a server.py at address (host, port). the server moves the snake, this
+# sends every arrow key pressed and draws the changes the server sends every tick
+def client_game_loop(address, incremental=False):
+    connection = socket.create_connection(address)
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    # the copy of the server's game, the board size comes with the first message
+    mirror = Mirror(Snake, Fruit)
+    while mirror.snake is None:
+        data = connection.recv(4096)
+        if not data:
+            raise ConnectionError(f"server at {address[0]}:{address[1]} closed the connection")
+        mirror.feed(data)
+    # from now on the frame goes on when nothing has arrived
+    connection.setblocking(False)
+
+    # initializes all necessary pygame modules
+    pygame.init()
+    bounds = (min(mirror.grid[0] * TILE, WINDOW[0]), min(mirror.grid[1] * TILE, WINDOW[1]))
+    game_window = pygame.display.set_mode(bounds)
+    pygame.display.set_caption(f"Snake ({address[0]}:{address[1]})")
+
+    fps = 60
+    clock = pygame.time.Clock()
+    renderer = make_renderer(mirror.grid, bounds, incremental)
+    # the head slides over the length of a tick after every tick that arrives
+    tick_length = 1 / mirror.hz
+    last_tick = time.perf_counter()
+
+    # plays until the window closes, Esc is pressed or the server goes away
+    run = True
+    while run:
+        for event in pygame.event.get():
+            # check if user exits game window or presses Esc
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                run = False
+            # the server decides if the turn is allowed
+            elif event.type == pygame.KEYDOWN and event.key in ARROWS:
+                connection.send(bytes((ARROWS[event.key].value,)))
+            # check if the window changed size or was uncovered
+            if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+
+        # plays every tick that arrived since the last frame
+        try:
+            data = connection.recv(65536)
+            # the server closed the connection
+            if not data:
+                run = False
+            elif mirror.feed(data):
+                last_tick = time.perf_counter()
+        except BlockingIOError:
+            pass
+        except ConnectionError:
+            run = False
+
+        # draw the fruit and snake
+        alpha = min((time.perf_counter() - last_tick) / tick_length, 1.0)
+        renderer.draw(game_window, mirror.snake, mirror.fruit, alpha)
+        clock.tick(fps)
+
+    connection.close()
+    # terminates pygame and python
+    pygame.quit()
+    sys.exit()
+
+# plays a recording in a window, speed is how many times faster than it was played
+def play_replay(path, speed=1.0, incremental=False):
+    replay = Replay(path)
+    # the window is the size of the recorded grid unless it is bigger than the default window
+    bounds = (min(replay.grid[0] * TILE, WINDOW[0]), min(replay.grid[1] * TILE, WINDOW[1]))
+
+    # initializes all necessary pygame modules
+    pygame.init()
+    game_window = pygame.display.set_mode(bounds)
+    pygame.display.set_caption("Snake (replay)")
+
+    # the recorded game with the snake and fruit that can be drawn
+    game = replay.game(Snake, Fruit)
+    # the last minute of ticks is kept so Backspace can go back a second at a time
+    history = engine.History(game, replay.hz * 60)
+    directions = replay.directions()
+    # ticks played in total, game.ticks starts over every time the snake dies
+    played = 0
+
+    # frames per second (number of iterations of main loop per second)
+    fps = 60
+    clock = pygame.time.Clock()
+    # at high speeds a frame has to play many ticks to keep up
+    hz = replay.hz * speed
+    timestep = engine.FixedTimestep(hz, max(5, int(hz // fps) * 2))
+    renderer = make_renderer(replay.grid, bounds, incremental)
+
+    # plays until the window closes, Esc is pressed or the recording runs out
+    run = True
+    while run:
+        # loops through events
+        for event in pygame.event.get():
+            # check if user exits game window or presses Esc
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                run = False
+            # check if the window changed size or was uncovered
+            if event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+            # go back a second and carry on playing the recording from there
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE:
+                played -= history.rewind(replay.hz)
+                directions = replay.directions(played)
+
+        # play every tick that is due since the last frame with the recorded direction
+        for _ in range(timestep.ticks()):
+            direction = next(directions, None)
+            # the recording is over
+            if direction is None:
+                run = False
+                break
+            history.step(direction)
+            played += 1
+
+        # draw the fruit and snake
+        renderer.draw(game_window, game.snake, game.fruit, timestep.alpha())
+        clock.tick(fps)
+
+    replay.close()
+    # terminates pygame and python
+    pygame.quit()
+    sys.exit()
+
 # runs if we're running the script itself
 # this won't run if this script is imported to another script
 if __name__ == "__main__":
-    main_game_loop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="plays snake")
+    parser.add_argument("--hz", type=int, default=12, help="number of tiles the snake moves per second")
+    parser.add_argument("--incremental", action="store_true", help="only redraw the parts of the window that changed")
+    parser.add_argument("--profile", action="store_true", help="print how long each part of a frame takes every few seconds")
+    parser.add_argument("--profile-json", default=None, help="file to write the profile to when the game closes (turns on --profile)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for where fruit spawns (random by default)")
+    parser.add_argument("--record", default=None, help="file to record the game to")
+    parser.add_argument("--replay", default=None, help="recording to play back instead of playing")
+    parser.add_argument("--speed", type=float, default=1.0, help="how many times faster than recorded to play back")
+    parser.add_argument("--autopilot", action="store_true", help="let the snake steer itself")
+    parser.add_argument("--connect", default=None, help="play on a server.py at HOST:PORT instead of here")
+    parser.add_argument("--board", default=None,
+                        help="size of the board in tiles as WIDTHxHEIGHT, i.e. 10000x10000 (the window size by default)")
+    args = parser.parse_args()
+    # recordings keep the seed as an 8 byte unsigned number
+    if args.record is not None and args.seed is not None and not 0 <= args.seed < MAX_SEED:
+        parser.error(f"--seed has to be from 0 to {MAX_SEED - 1} to be recorded")
+
+    # the board size is given as WIDTHxHEIGHT
+    board = None
+    if args.board is not None:
+        width, _, height = args.board.lower().partition("x")
+        board = (int(width), int(height))
+
+    # watch a recording
+    if args.replay is not None:
+        play_replay(args.replay, args.speed, args.incremental)
+
+    # play on a server
+    connect = None
+    if args.connect is not None:
+        host, _, port = args.connect.rpartition(":")
+        connect = (host or "127.0.0.1", int(port))
+
+    profiler = make_profiler(args.profile or args.profile_json is not None, args.profile_json)
+    main_game_loop(args.hz, args.incremental, profiler, args.seed, args.record, args.autopilot, board, connect)
\ No newline at end of file
@@ -0,0 +1,68 @@
+import os
+import sys
+import unittest
+
+# the modules are at the top of the repository next to this folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from arena import Arena
+from engine import Direction
+
+# an arena without fruit or respawning with a new snake on each (x, y) going each direction
+def arena_with(grid, placements):
+    arena = Arena(grid, len(placements), 0, seed=0, respawn=False)
+    for snake in arena.snakes:
+        snake.remove()
+    for snake, (pos, direction) in zip(arena.snakes, placements):
+        snake.spawn(pos, direction)
+    return arena
+
+class TestDeaths(unittest.TestCase):
+    def test_wall(self):
+        arena = arena_with((6, 6), [((0, 2), Direction.LEFT), ((3, 3), Direction.UP)])
+        self.assertEqual(arena.step().deaths, [(0, "wall")])
+        self.assertEqual(arena.alive(), 1)
+        self.assertEqual(set(arena.occupied), {2 * 6 + 3})
+
+    # two heads moving onto the same tile both die
+    def test_head_on(self):
+        arena = arena_with((6, 6), [((1, 1), Direction.RIGHT), ((3, 1), Direction.LEFT)])
+        self.assertEqual(arena.step().deaths, [(0, "head"), (1, "head")])
+        self.assertEqual(arena.alive(), 0)
+        self.assertEqual(arena.occupied, {})
+        self.assertEqual(len(arena.free_cells), 36)
+        self.assertEqual(arena.deaths, {"wall": 0, "head": 2, "body": 0})
+
+    # a head moving onto a tile another snake's body is still on dies, the other lives
+    def test_body(self):
+        arena = arena_with((6, 6), [((1, 1), Direction.RIGHT), ((1, 3), Direction.UP)])
+        # the first snake eats twice so its tail stays on (1, 1)
+        arena.fruits.tiles.update((1 * 6 + 2, 1 * 6 + 3))
+        self.assertEqual(arena.step([None, None]).deaths, [])
+        result = arena.step([None, None])
+        self.assertEqual(result.deaths, [(1, "body")])
+        self.assertIn(0, result.eaten)
+        self.assertEqual(len(arena.snakes[0]), 3)
+        self.assertEqual(set(arena.occupied), {1 * 6 + 1, 1 * 6 + 2, 1 * 6 + 3})
+
+    # a snake can follow another one's tail onto the tile it leaves the same tick
+    def test_following_tail(self):
+        arena = arena_with((6, 6), [((2, 1), Direction.RIGHT), ((1, 1), Direction.RIGHT)])
+        for _ in range(3):
+            self.assertEqual(arena.step().deaths, [])
+        self.assertEqual(arena.alive(), 2)
+
+class TestFruits(unittest.TestCase):
+    # boards so crowded that fruit gets eaten while every free tile has a fruit, the
+    # fruit that couldn't spawn then is owed and spawns once the board has room
+    def test_fruit_is_never_lost(self):
+        for grid, snakes, fruits, seed in (((4, 4), 3, 6, 10), ((6, 6), 10, 10, 1)):
+            with self.subTest(grid=grid, seed=seed):
+                arena = Arena(grid, snakes, fruits, seed=seed)
+                for _ in range(3000):
+                    arena.step()
+                    self.assertEqual(len(arena.fruits) + arena.fruits.owed, fruits)
+                    self.assertFalse(arena.fruits.tiles & set(arena.occupied))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import unittest
+
+# the modules are at the top of the repository next to this folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import engine
+from engine import DIRECTIONS
+
+try:
+    from batch import BatchGame, CAUSES
+except ImportError:
+    BatchGame = None
+
+# mostly heads for the fruit so snakes grow long enough to run into themselves and
+# fill small boards, with a random turn now and then
+def action(game, rng):
+    if rng.random() < 0.2:
+        return rng.choice(DIRECTIONS)
+    fruit_pos = game.fruit.fruit_pos
+    if fruit_pos is None:
+        return None
+    head_x, head_y = game.snake.head()
+    if fruit_pos[0] != head_x:
+        return engine.Direction.RIGHT if fruit_pos[0] > head_x else engine.Direction.LEFT
+    return engine.Direction.DOWN if fruit_pos[1] > head_y else engine.Direction.UP
+
+@unittest.skipIf(BatchGame is None, "batch.py needs numpy")
+class TestSameRules(unittest.TestCase):
+    # plays a BatchGame of one game and an engine.Game side by side with the same
+    # actions. the two pick fruit differently so the engine's fruit is put where
+    # the batch's is after every tick, then every tick has to end the same in both
+    def check_lockstep(self, grid, ticks, seed):
+        batch = BatchGame(1, grid, seed=seed)
+        game = engine.Game(grid, seed=seed)
+        rng = random.Random(seed)
+        causes = set()
+
+        for tick in range(ticks):
+            game.fruit.fruit_pos = None if batch.fruit_x[0] < 0 else (int(batch.fruit_x[0]), int(batch.fruit_y[0]))
+            direction = action(game, rng)
+            expected = game.step(direction)
+            result = batch.step([-1 if direction is None else direction.value])
+
+            got = (bool(result.ate[0]), CAUSES[result.cause[0]], int(result.length[0]),
+                   (int(batch.head_x[0]), int(batch.head_y[0])))
+            self.assertEqual(got, (expected.ate, expected.cause, expected.length, game.snake.head()), f"tick {tick}")
+            causes.add(expected.cause)
+        return causes
+
+    def test_boards(self):
+        for grid, ticks in (((36, 24), 20000), ((6, 4), 20000), ((3, 2), 20000)):
+            with self.subTest(grid=grid):
+                causes = self.check_lockstep(grid, ticks, seed=1)
+                self.assertLessEqual({"wall", "tail"}, causes)
+
+    # a tiny board gets filled often enough that wins are compared too
+    def test_wins(self):
+        self.assertIn("win", self.check_lockstep((2, 2), 5000, seed=2))
+
+if __name__ == "__main__":
+    unittest.main()
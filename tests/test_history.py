@@ -0,0 +1,127 @@
+import os
+import random
+import sys
+import unittest
+
+# the modules are at the top of the repository next to this folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import engine
+from engine import DIRECTIONS
+from autopilot import Autopilot
+
+# everything about a game that decides how it plays on, including the order of the
+# free tiles (fruit spawns by picking from them) and the random number generator
+def state(game):
+    snake = game.snake
+    free_cells = snake.free_cells
+    tiles = list(free_cells.cells) if free_cells.dense else sorted(free_cells.taken)
+    return (list(snake.body()), snake.prev_head, snake.current_dir, tuple(snake.user_dirs),
+            dict(snake.occupied), tiles, [free_cells.index(tile) for tile in snake.occupied],
+            game.fruit.fruit_pos, game.rng.getstate(), game.ticks, game.score)
+
+# random actions that turn about one tick in three
+def random_actions(seed, ticks):
+    rng = random.Random(seed)
+    return [rng.choice(DIRECTIONS) if rng.random() < 0.3 else None for _ in range(ticks)]
+
+class TestRewind(unittest.TestCase):
+    # plays the actions, rewinds by each amount in turn and checks the game is back in
+    # the state it was in that many ticks ago, then plays the rest again and checks
+    # every tick plays out the same as the first time
+    def check_rewind_replay(self, game, actions, rewinds):
+        history = engine.History(game, size=len(actions))
+        states = []
+        for action in actions:
+            states.append(state(game))
+            history.step(action)
+
+        position = len(actions)
+        for ticks in rewinds:
+            self.assertEqual(history.rewind(ticks), ticks)
+            position -= ticks
+            self.assertEqual(state(game), states[position])
+
+        for tick in range(position, len(actions)):
+            self.assertEqual(state(game), states[tick])
+            history.step(actions[tick])
+
+    def test_random_actions_with_deaths(self):
+        for grid in ((8, 6), (36, 24)):
+            with self.subTest(grid=grid):
+                self.check_rewind_replay(engine.Game(grid, seed=5), random_actions(1, 3000), (1, 7, 100, 500, 1000))
+
+    def test_sparse_board(self):
+        grid = (2000, 1000)
+        self.assertGreater(grid[0] * grid[1], engine.DENSE_LIMIT)
+        self.check_rewind_replay(engine.Game(grid, seed=5), random_actions(2, 2000), (3, 500, 1000))
+
+    # an autopilot on a tiny board fills it over and over, so rewinds go back over wins
+    def test_wins(self):
+        grid = (4, 4)
+        game = engine.Game(grid, seed=2)
+        history = engine.History(game, size=5000)
+        pilot = Autopilot(game.snake, game.fruit, grid)
+        states, actions, wins = [], [], 0
+        for _ in range(5000):
+            states.append(state(game))
+            actions.append(pilot.decide())
+            wins += history.step(actions[-1]).cause == "win"
+        self.assertGreater(wins, 0)
+
+        history.rewind(len(actions))
+        for tick, action in enumerate(actions):
+            self.assertEqual(state(game), states[tick])
+            history.step(action)
+
+    def test_rewind_past_start(self):
+        game = engine.Game((8, 6), seed=0)
+        history = engine.History(game, size=10)
+        start = state(game)
+        for _ in range(5):
+            history.step()
+        self.assertEqual(history.rewind(100), 5)
+        self.assertEqual(state(game), start)
+        self.assertEqual(history.rewind(), 0)
+
+class TestClone(unittest.TestCase):
+    # a clone and the game it came from share their body and free tiles until one of
+    # them moves, after that each plays on as if the other didn't exist
+    def test_clone_plays_like_original(self):
+        for grid in ((8, 6), (36, 24), (2000, 1000)):
+            with self.subTest(grid=grid):
+                game = engine.Game(grid, seed=3)
+                for action in random_actions(4, 200):
+                    game.step(action)
+                clones = [game.clone() for _ in range(3)]
+                before = state(game)
+                for clone in clones:
+                    self.assertEqual(state(clone), before)
+
+                # the first clone plays what the game plays, the others play something else
+                actions = random_actions(5, 1000)
+                for clone, seed in zip(clones[1:], (6, 7)):
+                    for action in random_actions(seed, 1000):
+                        clone.step(action)
+                self.assertEqual(state(game), before)
+                for action in actions:
+                    game.step(action)
+                    clones[0].step(action)
+                    self.assertEqual(state(clones[0]), state(game))
+
+    # a clone can be played through its own History without touching the original
+    def test_clone_rewind(self):
+        game = engine.Game((8, 6), seed=3)
+        for action in random_actions(8, 100):
+            game.step(action)
+        before = state(game)
+        clone = game.clone()
+        history = engine.History(clone)
+        for action in random_actions(9, 500):
+            history.step(action)
+        history.rewind(500)
+        self.assertEqual(state(clone), before)
+        self.assertEqual(state(game), before)
+
+if __name__ == "__main__":
+    unittest.main()
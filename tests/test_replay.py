@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+# the modules are at the top of the repository next to this folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import engine
+import replay
+from engine import DIRECTIONS, OPPOSITE
+from replay import MAX_SEED, Recorder, Replay
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "game.rec")
+
+    # plays a game with random turns, recording the direction of every tick like
+    # snake.py does, and returns the StepResult of every tick and the final game
+    def record(self, seed, grid, ticks):
+        game = engine.Game(grid, seed)
+        rng = random.Random(seed)
+        results = []
+        with Recorder(self.path, seed, grid, hz=12) as recorder:
+            for _ in range(ticks):
+                action = rng.choice(DIRECTIONS) if rng.random() < 0.2 else None
+                # the direction the snake moves, a turn into itself is ignored
+                direction = game.snake.current_dir
+                if action is not None and action != OPPOSITE[direction]:
+                    direction = action
+                results.append(game.step(action))
+                recorder.record(direction)
+        return results, game
+
+    # playing a recording gives exactly the same ticks as the game that was recorded
+    def test_round_trip(self):
+        results, game = self.record(7, (8, 6), 5000)
+        self.assertTrue(any(result.cause is not None for result in results))
+
+        played = []
+        with Replay(self.path) as recording:
+            self.assertEqual((recording.seed, recording.grid, recording.hz, len(recording)), (7, (8, 6), 12, 5000))
+            replayed = recording.play(on_tick=lambda _, result: played.append(result))
+
+        self.assertEqual(played, results)
+        self.assertEqual(list(replayed.snake.body()), list(game.snake.body()))
+        self.assertEqual(replayed.fruit.fruit_pos, game.fruit.fruit_pos)
+
+    # starting from a tick gives the same directions as reading from the start, on a
+    # recording long enough to be indexed in several blocks
+    def test_directions_from_tick(self):
+        self.record(3, (36, 24), 3 * replay.INDEX_STEP * 4)
+        with Replay(self.path) as recording:
+            directions = list(recording.directions())
+            self.assertEqual(len(directions), len(recording))
+            self.assertGreater(len(recording.index), 1)
+            for start in (0, 1, 63, 64, 65, replay.INDEX_STEP, len(directions) // 2, len(directions) - 1, len(directions)):
+                self.assertEqual(list(recording.directions(start)), directions[start:], start)
+
+    # the seed is kept in 8 bytes so seeds outside of them can't be recorded
+    def test_seed_range(self):
+        for seed in (0, MAX_SEED - 1):
+            Recorder(self.path, seed, (4, 4)).close()
+            with Replay(self.path) as recording:
+                self.assertEqual(recording.seed, seed)
+        for seed in (-1, MAX_SEED):
+            with self.assertRaises(ValueError):
+                Recorder(self.path, seed, (4, 4))
+
+if __name__ == "__main__":
+    unittest.main()
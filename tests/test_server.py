@@ -0,0 +1,60 @@
+import asyncio
+import os
+import random
+import sys
+import unittest
+
+# the modules are at the top of the repository next to this folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import server
+from server import FRUIT_MOVED, RESET, GameServer, Mirror
+
+# a Mirror that remembers the flags of every tick it played
+class FlagMirror(Mirror):
+    def __init__(self):
+        super().__init__()
+        self.flags = []
+
+    def apply(self, flags, head, fruit_tile):
+        self.flags.append(flags)
+        super().apply(flags, head, fruit_tile)
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    # a client on localhost turns randomly while the server is ticked by hand, and after
+    # every tick the client's copy of the game has to be the same as the server's
+    async def test_mirror_matches_game(self):
+        game_server = GameServer("127.0.0.1", 0, grid=(6, 4), hz=12, seed=0, max_sessions=1)
+        await game_server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", game_server.port)
+        try:
+            mirror = FlagMirror()
+            while mirror.grid is None:
+                mirror.feed(await asyncio.wait_for(reader.read(4096), 5))
+            session = next(iter(game_server.sessions))
+            game = session.game
+            self.assertEqual(mirror.grid, game.grid)
+            self.assertEqual(mirror.fruit.fruit_pos, game.fruit.fruit_pos)
+
+            rng = random.Random(0)
+            for tick in range(600):
+                if rng.random() < 0.3:
+                    writer.write(bytes((rng.randrange(len(server.DIRECTIONS)),)))
+                    await writer.drain()
+                    # let the server's handler read the turn before the tick
+                    await asyncio.sleep(0.001)
+                game_server.tick()
+                while mirror.feed(await asyncio.wait_for(reader.read(4096), 5)) == 0:
+                    pass
+                self.assertEqual(list(mirror.snake.body()), list(game.snake.body()), f"tick {tick}")
+                self.assertEqual(mirror.fruit.fruit_pos, game.fruit.fruit_pos, f"tick {tick}")
+
+            # the snake started over and the fruit moved at least once along the way
+            self.assertTrue(any(flags & RESET for flags in mirror.flags))
+            self.assertTrue(any(flags & FRUIT_MOVED for flags in mirror.flags))
+        finally:
+            writer.close()
+            await game_server.close()
+
+if __name__ == "__main__":
+    unittest.main()
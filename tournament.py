@@ -0,0 +1,136 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import sys
+import time
+
+import engine
+from engine import DIRECTIONS
+
+# this module plays many seeded games across every core and scores a policy.
+# a policy is any function that takes an engine.Game and returns the Direction
+# the snake should go (or None to keep going straight). policies are given on the
+# command line as "module:function" so they can be loaded in every worker process
+
+# policy that never turns
+def straight(game):
+    return None
+
+# policy that turns in a random direction every tick
+# it uses the game's random number generator so the seed decides the whole game
+def random_turns(game):
+    return game.rng.choice(DIRECTIONS)
+
+# policies that can be given by name instead of "module:function"
+POLICIES = {
+    "straight": straight,
+    "random": random_turns,
+}
+
+# finds the policy function from its name or "module:function"
+def load_policy(spec):
+    if spec in POLICIES:
+        return POLICIES[spec]
+
+    # split the module from the function name
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise ValueError(f"policy must be one of {sorted(POLICIES)} or module:function, got {spec!r}")
+
+    return getattr(importlib.import_module(module_name), function_name)
+
+# settings every worker process needs to play a game, set once by init_worker
+worker = {}
+
+# runs once in every worker process so the policy is only loaded once per process
+def init_worker(policy_spec, grid, max_ticks):
+    worker["policy"] = load_policy(policy_spec)
+    worker["grid"] = grid
+    worker["max_ticks"] = max_ticks
+
+# plays one game until the snake dies (or runs out of ticks) and returns its result
+def play_game(seed):
+    policy = worker["policy"]
+    max_ticks = worker["max_ticks"]
+    # the snake only gets one life so the game must not reset
+    game = engine.Game(worker["grid"], seed=seed, auto_reset=False)
+
+    result = None
+    while game.ticks < max_ticks:
+        result = game.step(policy(game))
+        # the snake died
+        if result.cause is not None:
+            break
+
+    # the snake survived every tick it was given
+    cause = result.cause if result is not None and result.cause is not None else "timeout"
+    return {
+        "seed": seed,
+        "score": game.score,
+        "length": len(game.snake),
+        "ticks": game.ticks,
+        "cause": cause,
+    }
+
+# plays a game for every seed across a pool of processes and streams the results to a JSONL file
+# returns a summary of all games played
+def run_tournament(policy_spec, seeds, output, grid=(36, 24), max_ticks=10000, processes=None, chunksize=64):
+    # make sure the policy exists before starting any processes
+    load_policy(policy_spec)
+
+    games = 0
+    ticks = 0
+    total_score = 0
+    best_score = 0
+    causes = {}
+    start = time.perf_counter()
+
+    with open(output, "w") as results_file, multiprocessing.Pool(
+        processes, initializer=init_worker, initargs=(policy_spec, grid, max_ticks)
+    ) as pool:
+        # results are written as soon as each game finishes, in whatever order they finish
+        for result in pool.imap_unordered(play_game, seeds, chunksize):
+            results_file.write(json.dumps(result) + "\n")
+            games += 1
+            ticks += result["ticks"]
+            total_score += result["score"]
+            best_score = max(best_score, result["score"])
+            causes[result["cause"]] = causes.get(result["cause"], 0) + 1
+
+    elapsed = time.perf_counter() - start
+    return {
+        "games": games,
+        "ticks": ticks,
+        "seconds": elapsed,
+        "games_per_second": games / elapsed if elapsed > 0 else 0.0,
+        "ticks_per_second": ticks / elapsed if elapsed > 0 else 0.0,
+        "mean_score": total_score / games if games > 0 else 0.0,
+        "best_score": best_score,
+        "causes": causes,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="plays many seeded games of snake with a policy across every core")
+    parser.add_argument("--policy", default="random", help="policy name (straight, random) or module:function")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the rest count up from it")
+    parser.add_argument("--output", default="tournament.jsonl", help="file the result of every game is written to")
+    parser.add_argument("--width", type=int, default=36, help="number of tiles in the x axis")
+    parser.add_argument("--height", type=int, default=24, help="number of tiles in the y axis")
+    parser.add_argument("--max-ticks", type=int, default=10000, help="ticks a snake can survive before the game ends")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default every core)")
+    args = parser.parse_args(argv)
+
+    seeds = range(args.seed, args.seed + args.games)
+    summary = run_tournament(args.policy, seeds, args.output, (args.width, args.height),
+                             args.max_ticks, args.processes)
+
+    print(f"{summary['games']} games, {summary['ticks']} ticks in {summary['seconds']:.2f}s "
+          f"({summary['games_per_second']:.0f} games/sec, {summary['ticks_per_second']:.0f} ticks/sec)")
+    print(f"mean score {summary['mean_score']:.2f}, best score {summary['best_score']}, causes {summary['causes']}")
+    return 0
+
+# runs if we're running the script itself
+if __name__ == "__main__":
+    sys.exit(main())